@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+# Uploaded music and background videos, stored once per distinct content
+ASSET_STORE_DIR = os.getenv('ASSET_STORE_DIR', 'asset_store')
+# Uploads are copied in pieces of this size, so memory use doesn't grow with the file
+CHUNK_SIZE = 1024 * 1024
+# Unreferenced assets older than this are removed by gc()
+ASSET_MAX_AGE = int(os.getenv('ASSET_MAX_AGE', str(7 * 24 * 3600)))
+
+Asset = namedtuple("Asset", "hash path size")
+
+
+class AssetStore:
+    """Content-addressed store for uploaded files, with reference counts for garbage collection."""
+
+    def __init__(self, root=ASSET_STORE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+
+        # hash -> {"name", "size", "last_used"}
+        self._index = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        # hash -> number of renders using the asset. Kept in memory only: a process that dies
+        # mid-render takes its references with it instead of pinning the asset forever.
+        self._refs = {}
+        for record in self._index.values():
+            record.pop("refs", None)
+
+    def _save_index(self):
+        temp_path = self.index_path + ".part"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def _path(self, record):
+        return os.path.join(self.root, record["name"])
+
+    def _asset(self, digest):
+        record = self._index[digest]
+        return Asset(digest, self._path(record), record["size"])
+
+    def put_stream(self, stream, suffix=""):
+        """Copy a file-like object into the store chunk by chunk, hashing as we go.
+
+        If the content is already stored the new copy is discarded and the existing asset returned.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+
+            key = digest.hexdigest()
+            with self._lock:
+                record = self._index.get(key)
+                if record is None or not os.path.exists(self._path(record)):
+                    # Fan out into subdirectories so no directory gets huge
+                    name = os.path.join(key[:2], key + suffix.lower())
+                    os.makedirs(os.path.join(self.root, key[:2]), exist_ok=True)
+                    os.replace(temp_path, os.path.join(self.root, name))
+                    temp_path = None
+                    record = {"name": name, "size": size}
+                    self._index[key] = record
+                record["last_used"] = time.time()
+                self._save_index()
+                return self._asset(key)
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def put_file(self, path):
+        with open(path, 'rb') as f:
+            return self.put_stream(f, os.path.splitext(path)[1])
+
+    def put_upload(self, upload):
+        """Store a Streamlit UploadedFile (or anything file-like with a .name)."""
+        upload.seek(0)
+        try:
+            return self.put_stream(upload, os.path.splitext(getattr(upload, "name", ""))[1])
+        finally:
+            upload.seek(0)
+
+    def get(self, key):
+        """Return the asset for a content hash, or None if it isn't stored."""
+        with self._lock:
+            record = self._index.get(key)
+            if record is None or not os.path.exists(self._path(record)):
+                return None
+            return self._asset(key)
+
+    def acquire(self, key):
+        """Mark an asset as in use so gc() leaves it alone."""
+        with self._lock:
+            record = self._index[key]
+            self._refs[key] = self._refs.get(key, 0) + 1
+            record["last_used"] = time.time()
+            self._save_index()
+            return self._asset(key)
+
+    def release(self, key):
+        with self._lock:
+            record = self._index.get(key)
+            if record is None:
+                return
+            refs = self._refs.pop(key, 0) - 1
+            if refs > 0:
+                self._refs[key] = refs
+            record["last_used"] = time.time()
+            self._save_index()
+
+    def gc(self, max_age=ASSET_MAX_AGE, max_bytes=None):
+        """Delete unreferenced assets not used within max_age seconds, then the least recently
+        used unreferenced ones until the store fits in max_bytes. Returns the number removed."""
+        removed = 0
+        now = time.time()
+        with self._lock:
+            unreferenced = sorted(
+                (record["last_used"], key)
+                for key, record in self._index.items()
+                if not self._refs.get(key)
+            )
+            total = sum(record["size"] for record in self._index.values())
+
+            for last_used, key in unreferenced:
+                too_old = now - last_used > max_age
+                too_big = max_bytes is not None and total > max_bytes
+                if not (too_old or too_big):
+                    continue
+                record = self._index.pop(key)
+                total -= record["size"]
+                removed += 1
+                try:
+                    os.unlink(self._path(record))
+                except OSError:
+                    pass
+
+            if removed:
+                self._save_index()
+        return removed
+
+
+_asset_store = None
+_asset_store_lock = threading.Lock()
+
+
+def get_asset_store():
+    """Process-wide asset store."""
+    global _asset_store
+    with _asset_store_lock:
+        if _asset_store is None:
+            _asset_store = AssetStore()
+        return _asset_store
@@ -0,0 +1,344 @@
+from html import escape
+
+from PIL import Image
+from PIL import ImageDraw
+
+from fonts import get_font_chain
+
+# Card layout shared by every renderer: an 800x1200 transparent canvas with the card near the top
+CARD_WIDTH, CARD_HEIGHT = 800, 1200
+
+# Where cards and overlay text sit in the 1080x1920 video frame
+CARD_POSITION = ('center', 400)
+OVERLAY_Y = 375
+
+def wrap_card_html(body):
+    """Wrap card markup in the page shared by every HTML renderer (green background for chroma keying)."""
+    html = f"""
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <style>
+            body {{
+                margin: 0;
+                padding: 0;
+                background-color: rgb(0, 255, 0);
+                overflow: hidden;
+            }}
+            /* Fix text rendering */
+            * {{
+                -webkit-font-smoothing: antialiased;
+                -moz-osx-font-smoothing: grayscale;
+            }}
+            /* Ensure clean white text */
+            .card-title {{
+                color: white !important;
+                text-shadow: none !important;
+                mix-blend-mode: normal !important;
+                background-color: transparent !important;
+                -webkit-text-fill-color: white !important;
+            }}
+        </style>
+    </head>
+    <body>
+        {body}
+    </body>
+    </html>
+    """
+    return html
+
+def create_card_html(category, title, description, active_choice, all_choices):
+    return wrap_card_html(create_card_html_body(category, title, description, active_choice, all_choices))
+
+def create_cards_batch_html(category, title, description, all_choices, active_choices=None, stacked=False):
+    """One document holding the card for every active choice, so a whole entry needs a single page load.
+    
+    By default only one card is visible at a time and setActive(i) switches between them.
+    With stacked=True every card gets its own 800x1200 slot, one below the other.
+    """
+    if active_choices is None:
+        active_choices = all_choices
+    
+    slot_style = f"position: relative; width: {CARD_WIDTH}px; height: {CARD_HEIGHT}px; overflow: hidden;"
+    states = ''.join(f'''
+        <div class="card-state" data-index="{i}" style="{slot_style if stacked else ''} display: {'block' if stacked or i == 0 else 'none'};">
+            {create_card_html_body(category, title, description, choice, all_choices)}
+        </div>
+        ''' for i, choice in enumerate(active_choices))
+    
+    script = """
+        <script>
+            function setActive(index) {
+                document.querySelectorAll('.card-state').forEach(function (el) {
+                    el.style.display = el.dataset.index == index ? 'block' : 'none';
+                });
+            }
+        </script>
+    """
+    return wrap_card_html(states + script)
+
+def _text(value):
+    # Entry text is user input - escape it so it renders literally and can't inject markup
+    return escape(str(value)) if value is not None else ""
+
+def create_card_html_body(category, title, description, active_choice, all_choices):
+    category, title, description = _text(category), _text(title), _text(description)
+    html = f"""
+    <div class="decision-card" style="background: #16171a; width: 85%; border-radius: 30px; padding: 32px; margin: 250px auto 32px auto;">
+        <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 24px;">
+            <div style="color: #5d89e2; font-family: 'Inter Tight', sans-serif; font-size: 36px; font-weight: 600;">{category}</div>
+            <div style="display: flex; gap: 16px; align-items: center;">
+                <div style="width: 52px; height: 52px; border-radius: 50%; border: 2px solid #39d2c0; background: transparent; display: flex; justify-content: center; align-items: center;">
+                    <svg width="30" height="30" viewBox="0 0 24 24" fill="none" style="mix-blend-mode: normal;">
+                        <path d="M12 2C9.243 2 7 4.243 7 7v3H6c-1.103 0-2 .897-2 2v8c0 1.103.897 2 2 2h12c1.103 0 2-.897 2-2v-8c0-1.103-.897-2-2-2h-1V7c0-2.757-2.243-5-5-5zm6 10v8H6v-8h12zm-9-2V7c0-1.654 1.346-3 3-3s3 1.346 3 3v3H9z" fill="white"/>
+                    </svg>
+                </div>
+            </div>
+        </div>
+        
+        <div class="card-title" style="font-family: 'Inter', sans-serif; font-size: 44px; font-weight: 600; margin-bottom: 12px; color: white !important; text-shadow: none !important; mix-blend-mode: normal !important; background-color: transparent !important; -webkit-text-fill-color: white !important;">{title}</div>
+        <div style="color: #95a1ac; font-size: 36px; font-weight: 600; margin-bottom: 32px; font-family: 'Inter', sans-serif;">{description}</div>
+        
+        <div style="display: flex; gap: 12px; margin-bottom: 32px; flex-wrap: wrap;">
+            {' '.join(f'''
+            <div style="padding: 12px 24px; border-radius: 16px; font-family: 'Inter', sans-serif; font-size: 28px; font-weight: 500;
+                background: #1b1a2f;
+                border: {'2px solid #5d89e2' if choice['name'] == active_choice['name'] else 'none'};
+                color: #95a1ac;">{_text(choice['name'])}</div>
+            ''' for choice in all_choices)}
+        </div>
+        
+        <div style="display: flex; margin-bottom: 24px;">
+            <div style="font-family: 'Inter', sans-serif; font-size: 32px; color: #95a1ac; min-width: 120px; font-weight: 600;">Pros:</div>
+            <div style="flex: 1;">
+                {''.join(f'''
+                <div style="margin-bottom: 12px; color: #95a1ac; font-size: 32px; font-family: Inter, sans-serif; font-weight: 500; display: flex;">
+                    <span style="min-width: 20px; margin-right: 16px;">•</span>
+                    <span style="flex: 1;">{_text(pro)}</span>
+                </div>
+                ''' for pro in active_choice['pros'])}
+            </div>
+        </div>
+
+        <div style="display: flex;">
+            <div style="font-family: 'Inter', sans-serif; font-size: 32px; color: #95a1ac; min-width: 120px; font-weight: 600;">Cons:</div>
+            <div style="flex: 1;">
+                 {''.join(f'''
+                <div style="margin-bottom: 12px; color: #95a1ac; font-size: 32px; font-family: Inter, sans-serif; font-weight: 500; display: flex;">
+                    <span style="min-width: 20px; margin-right: 16px;">•</span>
+                    <span style="flex: 1;">{_text(con)}</span>
+                </div>
+                ''' for con in active_choice['cons'])}
+            </div>
+        </div>
+    </div>
+    """
+    return html
+
+def create_card_image(category, title, description, active_choice, all_choices):
+    """Create a decision card directly as an image using PIL instead of HTML/Selenium."""
+    # Create a transparent background
+    width, height = CARD_WIDTH, CARD_HEIGHT
+    card = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(card)
+    
+    # Card dimensions - make it larger to match the HTML version
+    card_width = int(width * 0.85)
+    card_x = (width - card_width) // 2
+    card_y = 250
+    card_height = 850  # Increased height for content
+    
+    # Draw the card background with rounded corners
+    card_bg = Image.new('RGBA', (card_width, card_height), (22, 23, 26, 255))  # #16171a
+    
+    # Create a mask for rounded corners
+    mask = Image.new('L', (card_width, card_height), 0)
+    mask_draw = ImageDraw.Draw(mask)
+    corner_radius = 20
+    mask_draw.rounded_rectangle([(0, 0), (card_width, card_height)], corner_radius, fill=255)
+    
+    # Paste the card background with rounded corners
+    card.paste(card_bg, (card_x, card_y), mask)
+    
+    # Font chains fall back per character to fonts that cover other scripts and emoji,
+    # and are cached so the lookups only happen once per process
+    category_font = get_font_chain("bold", 36)
+    title_font = get_font_chain("bold", 44)
+    desc_font = get_font_chain("bold", 36)
+    choice_font = get_font_chain("regular", 28)
+    label_font = get_font_chain("bold", 32)
+    item_font = get_font_chain("regular", 32)
+    
+    # Draw category
+    category_color = (93, 137, 226, 255)  # #5d89e2
+    category_font.draw(draw, (card_x + 32, card_y + 32), category, fill=category_color)
+    
+    # Draw lock icon (simplified)
+    lock_x = card_x + card_width - 84
+    lock_y = card_y + 32
+    lock_size = 52
+    # Use pure white (255, 255, 255, 255) for the lock outline
+    draw.ellipse([(lock_x, lock_y), (lock_x + lock_size, lock_y + lock_size)], outline=(255, 255, 255, 255), width=2)
+    
+    # Draw title
+    # Use pure white (255, 255, 255, 255) for the title text
+    title_color = (255, 255, 255, 255)  # Pure white
+    title_font.draw(draw, (card_x + 32, card_y + 100), title, fill=title_color)
+    
+    # Draw description
+    desc_color = (149, 161, 172, 255)  # #95a1ac
+    desc_y = card_y + 170
+    
+    # Handle multiline description
+    desc_lines = desc_font.wrap(description, card_width - 64)  # 32px padding on each side
+    
+    # Draw each line of the description
+    for i, line in enumerate(desc_lines):
+        desc_font.draw(draw, (card_x + 32, desc_y + i * 40), line, fill=desc_color)
+    
+    # Update the y position for the next element
+    choices_y = int(desc_y + len(desc_lines) * 40 + 40)  # Add some spacing
+    
+    # Draw choices
+    choice_bg_color = (27, 26, 47, 255)  # #1b1a2f
+    choice_active_border = (93, 137, 226, 255)  # #5d89e2
+    
+    choice_x = card_x + 32
+    max_choice_y = choices_y  # Track the maximum y position
+    
+    for choice in all_choices:
+        choice_text = choice['name']
+        text_width = int(choice_font.getlength(choice_text))
+        text_height = int(choice_font.getbbox(choice_text)[3])
+        
+        # Draw choice background
+        choice_width = int(text_width + 48)
+        choice_height = int(text_height + 24)
+        
+        # Check if we need to wrap to the next line
+        if choice_x + choice_width > card_x + card_width - 32:
+            choice_x = card_x + 32
+            choices_y += choice_height + 12
+        
+        # Create a mask for rounded corners
+        choice_mask = Image.new('L', (choice_width, choice_height), 0)
+        choice_mask_draw = ImageDraw.Draw(choice_mask)
+        choice_mask_draw.rounded_rectangle([(0, 0), (choice_width, choice_height)], 16, fill=255)
+        
+        # Create the choice background
+        choice_bg = Image.new('RGBA', (choice_width, choice_height), choice_bg_color)
+        
+        # If this is the active choice, add a border
+        if choice['name'] == active_choice['name']:
+            choice_border = Image.new('RGBA', (choice_width, choice_height), (0, 0, 0, 0))
+            choice_border_draw = ImageDraw.Draw(choice_border)
+            choice_border_draw.rounded_rectangle([(0, 0), (choice_width, choice_height)], 16, outline=choice_active_border, width=2)
+            choice_bg = Image.alpha_composite(choice_bg, choice_border)
+        
+        # Paste the choice background
+        card.paste(choice_bg, (choice_x, choices_y), choice_mask)
+        
+        # Draw choice text
+        text_y = int(choices_y + (choice_height - text_height) // 2)
+        choice_font.draw(draw, (choice_x + 24, text_y), choice_text, fill=desc_color)
+        
+        # Move to next choice
+        choice_x += choice_width + 12
+        max_choice_y = max(max_choice_y, choices_y + choice_height)
+    
+    # Move down for pros/cons
+    content_y = int(max_choice_y + 40)
+    
+    # Draw pros
+    label_font.draw(draw, (card_x + 32, content_y), "Pros:", fill=desc_color)
+    item_y = content_y
+    
+    for pro in active_choice['pros']:
+        item_y += 50
+        # Draw bullet point
+        item_font.draw(draw, (card_x + 152, item_y), "•", fill=desc_color)
+        
+        # Handle multiline pros
+        pro_lines = item_font.wrap(pro, card_width - 250)  # Account for indentation and padding
+        
+        # Draw each line of the pro
+        for i, line in enumerate(pro_lines):
+            item_font.draw(draw, (card_x + 180, item_y + i * 40), line, fill=desc_color)
+        
+        # Update item_y for next pro
+        item_y += (len(pro_lines) - 1) * 40
+    
+    # Draw cons
+    cons_y = item_y + 80
+    label_font.draw(draw, (card_x + 32, cons_y), "Cons:", fill=desc_color)
+    item_y = cons_y
+    
+    for con in active_choice['cons']:
+        item_y += 50
+        # Draw bullet point
+        item_font.draw(draw, (card_x + 152, item_y), "•", fill=desc_color)
+        
+        # Handle multiline cons
+        con_lines = item_font.wrap(con, card_width - 250)  # Account for indentation and padding
+        
+        # Draw each line of the con
+        for i, line in enumerate(con_lines):
+            item_font.draw(draw, (card_x + 180, item_y + i * 40), line, fill=desc_color)
+        
+        # Update item_y for next con
+        item_y += (len(con_lines) - 1) * 40
+    
+    # Ensure the card is tall enough for all content
+    final_height = item_y + 80
+    if final_height > card_y + card_height:
+        # Create a new card background with the correct height
+        new_card_height = final_height - card_y
+        new_card_bg = Image.new('RGBA', (card_width, new_card_height), (22, 23, 26, 255))
+        
+        # Create a new mask for rounded corners
+        new_mask = Image.new('L', (card_width, new_card_height), 0)
+        new_mask_draw = ImageDraw.Draw(new_mask)
+        new_mask_draw.rounded_rectangle([(0, 0), (card_width, new_card_height)], corner_radius, fill=255)
+        
+        # Create a new card
+        new_card = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        
+        # Paste the new background
+        new_card.paste(new_card_bg, (card_x, card_y), new_mask)
+        
+        # Copy the original card content
+        new_card.paste(card, (0, 0), card.split()[3])
+        
+        card = new_card
+    
+    return card
+
+def create_final_decision_image(card, choice_name):
+    """Add a "Final pick" banner above an already rendered card."""
+    final = card.copy()
+    draw = ImageDraw.Draw(final)
+    
+    font = get_font_chain("bold", 36)
+    
+    label = f"Final pick: {choice_name}"
+    text_width = int(font.getlength(label))
+    text_height = int(font.getbbox(label)[3])
+    
+    # Centered pill just above the card (which starts at y=250)
+    banner_width = text_width + 64
+    banner_height = 64
+    banner_x = (CARD_WIDTH - banner_width) // 2
+    banner_y = 176
+    draw.rounded_rectangle(
+        [(banner_x, banner_y), (banner_x + banner_width, banner_y + banner_height)],
+        banner_height // 2,
+        fill=(57, 210, 192, 255)  # #39d2c0
+    )
+    font.draw(
+        draw,
+        (banner_x + 32, banner_y + (banner_height - text_height) // 2),
+        label,
+        fill=(22, 23, 26, 255)  # #16171a
+    )
+    
+    return final
@@ -0,0 +1,250 @@
+import os
+import threading
+from functools import lru_cache
+
+from PIL import Image
+from PIL import ImageDraw
+from PIL import ImageFont
+
+# fontTools reads a font's character map directly; without it we detect missing glyphs by rendering
+try:
+    from fontTools.ttLib import TTFont
+except ImportError:
+    TTFont = None
+
+# Fonts tried in order for each character. The first ones match the original card look,
+# the rest cover other scripts and emoji on Windows, macOS and Linux.
+# Extra fonts can be put in front with FONT_FALLBACKS (paths separated by os.pathsep).
+REGULAR_FONTS = [
+    "Arial", "arial.ttf", "Arial.ttf",
+    "DejaVuSans.ttf", "LiberationSans-Regular.ttf", "NotoSans-Regular.ttf",
+    # CJK
+    "msyh.ttc", "msgothic.ttc", "malgun.ttf", "NotoSansCJK-Regular.ttc", "PingFang.ttc", "Hiragino Sans GB.ttc",
+    # Other scripts
+    "Nirmala.ttf", "NotoSansArabic-Regular.ttf", "NotoSansHebrew-Regular.ttf",
+    "NotoSansDevanagari-Regular.ttf", "NotoSansThai-Regular.ttf", "Arial Unicode.ttf",
+    # Symbols and emoji
+    "seguiemj.ttf", "seguisym.ttf", "Apple Color Emoji.ttc", "NotoColorEmoji.ttf", "Symbola.ttf",
+]
+BOLD_FONTS = [
+    "Arial Bold", "arialbd.ttf", "Arial Bold.ttf",
+    "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf", "NotoSans-Bold.ttf",
+    "msyhbd.ttc", "malgunbd.ttf", "NotoSansCJK-Bold.ttc",
+    "NirmalaB.ttf",
+] + REGULAR_FONTS
+
+FONT_STYLES = {
+    "regular": REGULAR_FONTS,
+    "bold": BOLD_FONTS,
+}
+
+# Size used when checking which characters a font file covers (coverage doesn't depend on size)
+PROBE_SIZE = 32
+
+# Characters we never need a glyph for
+_ALWAYS_COVERED = {"\n", "\r", "\t", " ", "\u200d", "\ufe0f"}
+
+_coverage = {}
+_coverage_lock = threading.Lock()
+
+
+def _extra_fonts():
+    value = os.getenv('FONT_FALLBACKS', '')
+    return [path for path in value.split(os.pathsep) if path]
+
+
+def _load(name, size):
+    try:
+        return ImageFont.truetype(name, size)
+    except (OSError, ValueError):
+        # Not installed, or a bitmap-only font (e.g. color emoji) that can't be scaled
+        return None
+
+
+@lru_cache(maxsize=None)
+def _cmap(path, index):
+    # All codepoints mapped by the font, or None if fontTools can't read it
+    if TTFont is None:
+        return None
+    try:
+        font = TTFont(path, fontNumber=index, lazy=True)
+        return frozenset(font.getBestCmap() or ())
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=None)
+def _probe(path, index):
+    try:
+        return ImageFont.truetype(path, PROBE_SIZE, index=index)
+    except (OSError, ValueError):
+        return None
+
+
+def _raster(font, text):
+    left, top, right, bottom = font.getbbox(text)
+    image = Image.new('L', (max(1, right - left), max(1, bottom - top)), 0)
+    ImageDraw.Draw(image).text((-left, -top), text, font=font, fill=255)
+    return image.size, image.tobytes()
+
+
+@lru_cache(maxsize=None)
+def _notdef(path, index):
+    # What the font draws for a codepoint it doesn't have (an empty box or nothing)
+    return _raster(_probe(path, index), "\U0010FFFD")
+
+
+def font_covers(font, char):
+    """Whether font has a glyph for char. Results are cached per font file and codepoint."""
+    if char in _ALWAYS_COVERED:
+        return True
+    path = getattr(font, "path", None)
+    if not isinstance(path, str):
+        # PIL's built-in default font - nothing better to compare against
+        return True
+    index = getattr(font, "index", 0)
+
+    key = (path, index, char)
+    with _coverage_lock:
+        if key in _coverage:
+            return _coverage[key]
+
+    cmap = _cmap(path, index)
+    if cmap is not None:
+        covered = ord(char) in cmap
+    else:
+        probe = _probe(path, index)
+        covered = probe is not None and _raster(probe, char) != _notdef(path, index)
+
+    with _coverage_lock:
+        _coverage[key] = covered
+    return covered
+
+
+class FontChain:
+    """A list of fonts at one size, used together so every character is drawn by the first font that has it.
+
+    Offers the parts of the FreeTypeFont API the cards use (getlength, getbbox) plus draw().
+    """
+
+    def __init__(self, fonts):
+        self.fonts = fonts or [ImageFont.load_default()]
+        self.primary = self.fonts[0]
+        # codepoint -> index into self.fonts
+        self._resolved = {}
+        self._lock = threading.Lock()
+        # Every run is drawn on the primary font's baseline
+        try:
+            self.ascent = self.primary.getmetrics()[0]
+        except AttributeError:
+            self.ascent = 0
+
+    def font_for(self, char):
+        index = self._resolved.get(char)
+        if index is None:
+            index = 0
+            for i, font in enumerate(self.fonts):
+                if font_covers(font, char):
+                    index = i
+                    break
+            with self._lock:
+                self._resolved[char] = index
+        return self.fonts[index]
+
+    def runs(self, text):
+        """Split text into (substring, font) runs that share a font."""
+        runs = []
+        current_font = None
+        start = 0
+        for i, char in enumerate(text):
+            # Joiners and variation selectors stay with the character before them
+            font = current_font if char in _ALWAYS_COVERED and current_font else self.font_for(char)
+            if font is not current_font:
+                if current_font is not None:
+                    runs.append((text[start:i], current_font))
+                current_font = font
+                start = i
+        if current_font is not None:
+            runs.append((text[start:], current_font))
+        return runs
+
+    def getlength(self, text):
+        return sum(font.getlength(run) for run, font in self.runs(text))
+
+    def wrap(self, text, max_width):
+        """Break text into lines no wider than max_width. Words are split on spaces; a word
+        that is too long on its own (or text without spaces, as in Chinese or Japanese) is
+        broken between characters."""
+        lines = []
+        current_line = ""
+
+        for word in text.split():
+            test_line = current_line + " " + word if current_line else word
+            if self.getlength(test_line) <= max_width:
+                current_line = test_line
+                continue
+
+            if current_line:
+                lines.append(current_line)
+                current_line = ""
+
+            # Fill lines character by character until the rest of the word fits
+            for char in word:
+                if current_line and self.getlength(current_line + char) > max_width:
+                    lines.append(current_line)
+                    current_line = ""
+                current_line += char
+
+        if current_line:
+            lines.append(current_line)
+        return lines
+
+    def getbbox(self, text):
+        """Bounding box as drawn by draw() at (0, 0)."""
+        left = right = 0
+        top = bottom = None
+        x = 0
+        for run, font in self.runs(text):
+            run_left, run_top, run_right, run_bottom = self._run_bbox(run, font)
+            if top is None:
+                left = x + run_left
+                top, bottom = run_top, run_bottom
+            else:
+                top, bottom = min(top, run_top), max(bottom, run_bottom)
+            right = x + run_right
+            x += font.getlength(run)
+        return (left, top or 0, right, bottom or 0)
+
+    def _run_bbox(self, run, font):
+        if isinstance(font, ImageFont.FreeTypeFont):
+            bbox = font.getbbox(run, anchor="ls")
+            return (bbox[0], bbox[1] + self.ascent, bbox[2], bbox[3] + self.ascent)
+        return font.getbbox(run)
+
+    def draw(self, draw, xy, text, fill):
+        """Draw text with its top-left at xy, like ImageDraw.text with the default anchor."""
+        x, y = xy
+        for run, font in self.runs(text):
+            if isinstance(font, ImageFont.FreeTypeFont):
+                draw.text((x, y + self.ascent), run, font=font, fill=fill, anchor="ls", embedded_color=True)
+            else:
+                draw.text((x, y), run, font=font, fill=fill)
+            x += font.getlength(run)
+
+
+@lru_cache(maxsize=None)
+def get_font_chain(style="regular", size=32):
+    """Cached FontChain for a style ("regular" or "bold") and size, so fonts load once per process."""
+    fonts = []
+    seen = set()
+    for name in _extra_fonts() + FONT_STYLES[style]:
+        font = _load(name, size)
+        if font is None:
+            continue
+        # Several candidate names can resolve to the same file
+        key = (getattr(font, "path", name), getattr(font, "index", 0))
+        if key in seen:
+            continue
+        seen.add(key)
+        fonts.append(font)
+    return FontChain(fonts)
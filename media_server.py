@@ -0,0 +1,188 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlsplit, parse_qs
+
+# Small HTTP server that streams rendered videos from disk with byte-range support,
+# so viewers never need the whole MP4 loaded into the app's memory.
+MEDIA_SERVER_HOST = os.getenv('MEDIA_SERVER_HOST', '127.0.0.1')
+MEDIA_SERVER_PORT = int(os.getenv('MEDIA_SERVER_PORT', '8765'))
+# Public base URL the browser reaches the server at. The app only streams through the
+# media server when this is set, since 127.0.0.1 is only reachable from the same machine.
+MEDIA_SERVER_URL = os.getenv('MEDIA_SERVER_URL', '')
+# Registered URLs stop working after this many seconds, and only the newest are kept
+MEDIA_TOKEN_TTL = int(os.getenv('MEDIA_TOKEN_TTL', '3600'))
+MEDIA_MAX_TOKENS = 256
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, file_size):
+    """Parse a single 'bytes=a-b' Range header. Returns (start, end) inclusive, or None if unusable."""
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if start == '' and end == '':
+        return None
+    if start == '':
+        # Suffix range: last N bytes
+        length = int(end)
+        if length == 0:
+            return None
+        start = max(0, file_size - length)
+        end = file_size - 1
+    else:
+        start = int(start)
+        end = int(end) if end else file_size - 1
+        end = min(end, file_size - 1)
+    if start > end or start >= file_size:
+        return None
+    return start, end
+
+
+def send_file(handler, path, send_body=True, content_type='video/mp4', download_name=None):
+    """Answer a GET/HEAD on a BaseHTTPRequestHandler with the file at path, honouring Range requests."""
+    file_size = os.path.getsize(path)
+    byte_range = parse_range(handler.headers.get('Range'), file_size)
+    if handler.headers.get('Range') and byte_range is None:
+        handler.send_response(416)
+        handler.send_header('Content-Range', f'bytes */{file_size}')
+        handler.end_headers()
+        return
+
+    if byte_range:
+        start, end = byte_range
+        handler.send_response(206)
+        handler.send_header('Content-Range', f'bytes {start}-{end}/{file_size}')
+    else:
+        start, end = 0, file_size - 1
+        handler.send_response(200)
+
+    length = end - start + 1 if file_size else 0
+    handler.send_header('Content-Type', content_type)
+    handler.send_header('Content-Length', str(length))
+    handler.send_header('Accept-Ranges', 'bytes')
+    handler.send_header('Access-Control-Allow-Origin', '*')
+    handler.send_header('Cache-Control', 'no-cache')
+    if download_name is not None:
+        filename = os.path.basename(download_name) or os.path.basename(path)
+        handler.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+    handler.end_headers()
+
+    if not send_body or not length:
+        return
+
+    # Stream the requested range in small chunks
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        try:
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                handler.wfile.write(chunk)
+                remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # Browsers routinely drop range requests when seeking
+            pass
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    # Filled in by MediaServer: token -> (absolute file path, expiry time)
+    files = {}
+
+    def log_message(self, format, *args):
+        # Keep the Streamlit console quiet
+        pass
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        parts = urlsplit(self.path)
+        segments = parts.path.strip('/').split('/')
+        if len(segments) < 2 or segments[0] != 'media':
+            self.send_error(404)
+            return
+
+        path, expires = self.files.get(segments[1], (None, 0))
+        if path is None or expires < time.time() or not os.path.exists(path):
+            self.send_error(404)
+            return
+
+        query = parse_qs(parts.query)
+        download_name = query['download'][0] if 'download' in query else None
+        send_file(self, path, send_body, download_name=download_name)
+
+
+class MediaServer:
+    """Background thread serving registered files over HTTP."""
+
+    def __init__(self, host=MEDIA_SERVER_HOST, port=MEDIA_SERVER_PORT, base_url=MEDIA_SERVER_URL):
+        handler = type('BoundMediaHandler', (MediaHandler,), {'files': OrderedDict()})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.files = handler.files
+        self._lock = threading.Lock()
+        port = self.httpd.server_address[1]
+        self.base_url = (base_url or f'http://{host}:{port}').rstrip('/')
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url_for(self, path, download_name=None):
+        """Register a file and return the URL it is served at. Pass download_name to serve it as an attachment."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        # Include size/mtime so browsers don't reuse a stale copy of a rewritten file
+        token = hashlib.sha1(f'{path}:{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8')).hexdigest()[:16]
+        with self._lock:
+            self._expire_tokens()
+            self.files[token] = (path, time.time() + MEDIA_TOKEN_TTL)
+            self.files.move_to_end(token)
+            while len(self.files) > MEDIA_MAX_TOKENS:
+                self.files.popitem(last=False)
+        url = f'{self.base_url}/media/{token}/{quote(os.path.basename(path))}'
+        if download_name:
+            url += f'?download={quote(download_name)}'
+        return url
+
+    def _expire_tokens(self):
+        now = time.time()
+        for token in [token for token, (_, expires) in self.files.items() if expires < now]:
+            del self.files[token]
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+_media_server = None
+_media_server_lock = threading.Lock()
+
+
+def get_media_server():
+    """Start the media server once per process. Returns None when MEDIA_SERVER_URL isn't
+    configured or the server can't bind."""
+    global _media_server
+    if not MEDIA_SERVER_URL:
+        return None
+    with _media_server_lock:
+        if _media_server is None:
+            try:
+                _media_server = MediaServer()
+            except OSError:
+                return None
+        return _media_server
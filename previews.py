@@ -0,0 +1,97 @@
+import io
+
+from PIL import Image
+from PIL import ImageDraw
+
+from cards import CARD_POSITION, OVERLAY_Y
+from fonts import get_font_chain
+
+# Previews are composited straight from the card images with PIL, skipping MoviePy and x264.
+# Frame layout matches the video: 1080x1920, card at y=400, overlay text at y=375.
+FRAME_SIZE = (1080, 1920)
+OVERLAY_FONT_SIZE = 55
+
+POSTER_FORMATS = {"png": "PNG", "webp": "WEBP"}
+ANIMATION_FORMATS = {"gif": "GIF", "webp": "WEBP"}
+MIME_TYPES = {"png": "image/png", "webp": "image/webp", "gif": "image/gif"}
+
+
+def _background(text, size):
+    """Black frame with the overlay text drawn on it, shared by every preview frame."""
+    width, height = FRAME_SIZE
+    frame = Image.new('RGBA', FRAME_SIZE, (0, 0, 0, 255))
+    if text:
+        draw = ImageDraw.Draw(frame)
+        font = get_font_chain("regular", OVERLAY_FONT_SIZE)
+        line_height = int(OVERLAY_FONT_SIZE * 1.2)
+        for i, line in enumerate(font.wrap(text, width - 150)):
+            line_x = (width - font.getlength(line)) // 2
+            font.draw(draw, (line_x, OVERLAY_Y + i * line_height), line, fill=(255, 255, 255, 255))
+    if size != FRAME_SIZE:
+        frame = frame.resize(size, Image.LANCZOS)
+    return frame
+
+
+def _compose(background, card):
+    scale = background.width / FRAME_SIZE[0]
+    if scale != 1:
+        card = card.resize((round(card.width * scale), round(card.height * scale)), Image.LANCZOS)
+    frame = background.copy()
+    x = (background.width - card.width) // 2 if CARD_POSITION[0] == 'center' else round(CARD_POSITION[0] * scale)
+    y = round(CARD_POSITION[1] * scale)
+    frame.alpha_composite(card.convert('RGBA'), (x, y))
+    return frame
+
+
+def _preview_size(width):
+    return (width, round(FRAME_SIZE[1] * width / FRAME_SIZE[0]))
+
+
+def create_poster(card, text, width=540, fmt="png"):
+    """Single composited frame of a card with the overlay text. Returns encoded image bytes."""
+    frame = _compose(_background(text, _preview_size(width)), card)
+    output = io.BytesIO()
+    if fmt == "webp":
+        frame.save(output, POSTER_FORMATS[fmt], quality=90, method=4)
+    else:
+        frame.convert('RGB').save(output, POSTER_FORMATS[fmt], optimize=True)
+    return output.getvalue()
+
+
+def create_animated_preview(cards, text, frame_duration=1.5, width=360, fmt="gif"):
+    """Small looping animation that steps through the cards. Returns encoded image bytes.
+
+    frame_duration is in seconds, either one value for every card or a list with one per card.
+    GIF frames share one adaptive palette built from all of them, so colours stay stable
+    between cards and the file stays small.
+    """
+    background = _background(text, _preview_size(width))
+    frames = [_compose(background, card).convert('RGB') for card in cards]
+    if isinstance(frame_duration, (list, tuple)):
+        duration_ms = [int(float(seconds) * 1000) for seconds in frame_duration]
+    else:
+        duration_ms = int(float(frame_duration) * 1000)
+    output = io.BytesIO()
+
+    if fmt == "webp":
+        frames[0].save(
+            output, ANIMATION_FORMATS[fmt],
+            save_all=True, append_images=frames[1:],
+            duration=duration_ms, loop=0, quality=80, method=4
+        )
+        return output.getvalue()
+
+    # Build the palette from a strip of every frame side by side
+    strip = Image.new('RGB', (width * len(frames), frames[0].height))
+    for i, frame in enumerate(frames):
+        strip.paste(frame, (i * width, 0))
+    palette = strip.quantize(colors=128, method=Image.MEDIANCUT)
+
+    paletted = [frame.quantize(palette=palette, dither=Image.NONE) for frame in frames]
+    # Without an explicit palette Pillow gives every delta frame its own colour table
+    paletted[0].save(
+        output, ANIMATION_FORMATS[fmt],
+        save_all=True, append_images=paletted[1:], palette=bytes(palette.getpalette()),
+        duration=duration_ms, loop=0, optimize=True, disposal=1
+    )
+    return output.getvalue()
@@ -0,0 +1,564 @@
+"""Local HTTP render API for programmatic clients.
+
+Run with:  python render_server.py --port 8770
+
+    POST /assets?name=music.m4a      raw file body -> {"hash": ...}
+    POST /jobs                       {"entry": {...}, "audio": hash, "background": hash,
+                                      "timeline": {...}, "output": "video" | "poster" | "animation",
+                                      "format": "png" | "webp" | "gif"} -> {"id": ..., "status": ...}
+    GET  /jobs/<id>                  status
+    GET  /jobs/<id>/result           finished file (supports Range requests)
+    GET  /health                     renderer, queue and cache stats
+
+The entry has the same shape as the values in saved_entries.json.
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from asset_store import get_asset_store
+from fonts import get_font_chain
+from media_server import send_file
+from previews import POSTER_FORMATS, ANIMATION_FORMATS, MIME_TYPES, create_poster, create_animated_preview
+from renderers import AUTO, CAP_BATCH, RENDER_WORKERS, close_renderers, get_renderer
+from timeline import RENDER_SETTINGS, DEFAULT_TIMELINE, compile_timeline, render_states, load_background, render_video
+from video_cache import get_video_cache, normalize_entry, make_cache_key
+
+RENDER_SERVER_HOST = os.getenv('RENDER_SERVER_HOST', '127.0.0.1')
+RENDER_SERVER_PORT = int(os.getenv('RENDER_SERVER_PORT', '8770'))
+RENDER_OUTPUT_DIR = os.getenv('RENDER_OUTPUT_DIR', 'render_jobs')
+# Jobs encoded at the same time; card rendering is shared through the batcher
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# How long the batcher waits for other jobs' requests before dispatching them together
+BATCH_WINDOW = float(os.getenv('BATCH_WINDOW', '0.02'))
+MAX_BATCH_CARDS = 64
+# Finished jobs are forgotten after this many seconds (their files stay in the video cache)
+JOB_TTL = 3600
+
+
+_resolve_lock = threading.Lock()
+
+
+def _resolve(future, result=None, error=None):
+    """Settle a future unless it already has been (e.g. failed by a dispatch error)."""
+    with _resolve_lock:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+class CardBatcher:
+    """Funnels card render requests from concurrent jobs onto one bounded render pool.
+
+    Requests that arrive within the batch window are dispatched together, but each entry is
+    still its own render call: CAP_BATCH backends load one page per entry, and the others
+    render one card per pool task. The point is to share the warm renderer and cap how many
+    renders run at once, however many jobs are in flight.
+    """
+
+    def __init__(self, renderer, window=BATCH_WINDOW, max_cards=MAX_BATCH_CARDS, workers=RENDER_WORKERS):
+        self.renderer = renderer
+        self.window = window
+        self.max_cards = max_cards
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.batches = 0
+        self.cards = 0
+        self._requests = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, category, title, description, choices, active_choices):
+        """Queue cards for rendering. The returned future resolves to the images, in order."""
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("Card batcher is closed"))
+        else:
+            self._requests.put((category, title, description, choices, active_choices, future))
+        return future
+
+    def close(self):
+        """Stop taking requests, fail the ones still queued and wait for running renders."""
+        self._closed = True
+        self._requests.put(None)
+        self._thread.join()
+        self.pool.shutdown(wait=True)
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                _resolve(request[5], error=RuntimeError("Card batcher is closed"))
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            batch = [request]
+            count = len(request[4])
+            deadline = time.monotonic() + self.window
+            while count < self.max_cards:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    # Closing - put the marker back for the outer loop
+                    self._requests.put(None)
+                    break
+                batch.append(request)
+                count += len(request[4])
+            self.batches += 1
+            self.cards += count
+            try:
+                self._dispatch(batch)
+            except Exception as error:
+                # Never let the thread die: callers block on these futures without a timeout
+                for request in batch:
+                    _resolve(request[5], error=error)
+
+    def _dispatch(self, batch):
+        if self.renderer.has(CAP_BATCH):
+            # The backend is fastest with a whole entry per call (one page load each)
+            for category, title, description, choices, active_choices, future in batch:
+                work = self.pool.submit(
+                    self.renderer.render_all, category, title, description, choices,
+                    max_workers=1, active_choices=active_choices
+                )
+                self._forward(work, future)
+            return
+
+        # Otherwise spread every card of every job in the batch across the pool
+        for category, title, description, choices, active_choices, future in batch:
+            cards = [
+                self.pool.submit(self.renderer.render, category, title, description, choice, choices)
+                for choice in active_choices
+            ]
+            self._gather(cards, future)
+
+    def _forward(self, work, future):
+        def done(work):
+            error = work.exception()
+            if error:
+                _resolve(future, error=error)
+            else:
+                _resolve(future, work.result())
+        work.add_done_callback(done)
+
+    def _gather(self, cards, future):
+        lock = threading.Lock()
+        remaining = [len(cards)]
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            try:
+                _resolve(future, [card.result() for card in cards])
+            except Exception as error:
+                _resolve(future, error=error)
+
+        if not cards:
+            _resolve(future, [])
+        for card in cards:
+            card.add_done_callback(done)
+
+
+class BatchedRenderer:
+    """Looks like a CardRenderer to the timeline code but sends its work through a CardBatcher."""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self.name = batcher.renderer.name
+        self.capabilities = batcher.renderer.capabilities
+
+    def has(self, capability):
+        return capability in self.capabilities
+
+    def render_all(self, category, title, description, choices, max_workers=None, active_choices=None):
+        if active_choices is None:
+            active_choices = choices
+        return self.batcher.submit(category, title, description, choices, active_choices).result()
+
+    def render(self, category, title, description, active_choice, all_choices):
+        return self.render_all(category, title, description, all_choices, active_choices=[active_choice])[0]
+
+
+def validate_entry(entry):
+    """Check an entry has the saved_entries.json shape and return a copy with the optional
+    fields filled in, since the card code indexes them directly. Raises ValueError with a
+    readable message."""
+    if not isinstance(entry, dict):
+        raise ValueError("entry must be an object")
+    for field in ("category", "title", "description", "video_text"):
+        if not isinstance(entry.get(field, ""), str):
+            raise ValueError(f"entry.{field} must be a string")
+    choices = entry.get("choices")
+    if not isinstance(choices, list) or not choices:
+        raise ValueError("entry.choices must be a non-empty list")
+    for i, choice in enumerate(choices):
+        if not isinstance(choice, dict) or not isinstance(choice.get("name"), str) or not choice["name"].strip():
+            raise ValueError(f"entry.choices[{i}] must have a name")
+        for field in ("pros", "cons"):
+            items = choice.get(field, [])
+            if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+                raise ValueError(f"entry.choices[{i}].{field} must be a list of strings")
+
+    normalized = {field: entry.get(field, "") for field in ("category", "title", "description", "video_text")}
+    normalized["choices"] = [
+        {"name": choice["name"], "pros": choice.get("pros", []), "cons": choice.get("cons", [])}
+        for choice in choices
+    ]
+    return normalized
+
+
+class RenderService:
+    """Job queue shared by every request. Fonts, the renderer and the batcher stay warm for its lifetime."""
+
+    def __init__(self, renderer_name=AUTO, output_dir=RENDER_OUTPUT_DIR, job_workers=JOB_WORKERS):
+        self.renderer = get_renderer(renderer_name)
+        self.batcher = CardBatcher(self.renderer)
+        self.batched_renderer = BatchedRenderer(self.batcher)
+        self.output_dir = output_dir
+        self.asset_store = get_asset_store()
+        self.video_cache = get_video_cache()
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, job_workers))
+        os.makedirs(output_dir, exist_ok=True)
+        self.warm_up()
+
+    def warm_up(self):
+        # Load the font chains the cards and previews use, and render one card
+        for style, size in (("bold", 36), ("bold", 44), ("bold", 32), ("regular", 28), ("regular", 32), ("regular", 55)):
+            get_font_chain(style, size)
+        sample = [{"name": "Warm up", "pros": ["Ready"], "cons": []}]
+        self.renderer.render("Warm up", "Warm up", "", sample[0], sample)
+
+    def submit(self, request):
+        """Validate a job request and queue it. Returns the job record."""
+        entry = validate_entry(request.get("entry"))
+
+        output = request.get("output", "video")
+        if output not in ("video", "poster", "animation"):
+            raise ValueError("output must be 'video', 'poster' or 'animation'")
+        fmt = "mp4"
+        if output != "video":
+            formats = POSTER_FORMATS if output == "poster" else ANIMATION_FORMATS
+            fmt = request.get("format") or next(iter(formats))
+            if not isinstance(fmt, str) or fmt not in formats:
+                raise ValueError(f"format must be one of {', '.join(formats)}")
+
+        assets = {}
+        for field in ("audio", "background"):
+            key = request.get(field)
+            if key:
+                if not isinstance(key, str):
+                    raise ValueError(f"{field} must be an asset hash string")
+                if self.asset_store.get(key) is None:
+                    raise ValueError(f"Unknown {field} asset: {key}")
+                assets[field] = key
+
+        timeline = request.get("timeline") or {}
+        if not isinstance(timeline, dict):
+            raise ValueError("timeline must be an object")
+        timeline_spec = dict(DEFAULT_TIMELINE, **timeline)
+        if "overlays" not in timeline:
+            video_text = entry.get("video_text", "")
+            timeline_spec["overlays"] = [{"text": video_text}] if video_text else []
+        # Fail fast on a bad timeline rather than inside the worker. compile_timeline checks the
+        # types of intro, final_decision and overlays too, so malformed JSON becomes a 400.
+        compile_timeline(timeline_spec, len(entry["choices"]), fps=RENDER_SETTINGS["fps"])
+
+        # Hold the assets until the job is done so garbage collection can't remove them
+        for key in assets.values():
+            self.asset_store.acquire(key)
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "output": output,
+            "format": fmt,
+            "created": time.time(),
+            "updated": time.time(),
+            "cached": False,
+            "error": None,
+            "plan": None,
+            "path": None,
+        }
+        with self._lock:
+            self.jobs[job["id"]] = job
+        self._executor.submit(self._run, job, entry, assets, timeline_spec)
+        self._expire_jobs()
+        return job
+
+    def _update(self, job, **changes):
+        with self._lock:
+            job.update(changes, updated=time.time())
+
+    def _run(self, job, entry, assets, timeline_spec):
+        try:
+            audio = self.asset_store.get(assets["audio"]) if "audio" in assets else None
+            background = self.asset_store.get(assets["background"]) if "background" in assets else None
+            choices = entry["choices"]
+
+            plan = compile_timeline(timeline_spec, len(choices), fps=RENDER_SETTINGS["fps"])
+            self._update(job, plan=plan.describe())
+
+            if job["output"] == "video":
+                self._render_video(job, entry, plan, timeline_spec, audio, background)
+            else:
+                self._render_preview(job, entry, plan)
+        except Exception as e:
+            self._update(job, status="failed", error=str(e))
+        finally:
+            for key in assets.values():
+                self.asset_store.release(key)
+            # Uploads through /assets are only removed here, as in the app after each render
+            self.asset_store.gc()
+
+    def _render_states(self, job, entry, plan):
+        self._update(job, status="rendering")
+        return render_states(
+            plan, self.batched_renderer,
+            entry.get("category", ""), entry.get("title", ""), entry.get("description", ""), entry["choices"]
+        )
+
+    def _render_video(self, job, entry, plan, timeline_spec, audio, background):
+        cache_key = make_cache_key(
+            normalize_entry(entry.get("video_text", ""), entry.get("category", ""), entry.get("title", ""),
+                            entry.get("description", ""), entry["choices"]),
+            audio_hash=audio.hash if audio else None,
+            bg_hash=background.hash if background else None,
+            settings=dict(RENDER_SETTINGS, renderer=self.renderer.name, timeline=timeline_spec)
+        )
+        cached = self.video_cache.get(cache_key)
+        if cached:
+            self._update(job, status="done", cached=True, path=cached)
+            return
+
+        state_images = self._render_states(job, entry, plan)
+
+        self._update(job, status="encoding")
+        width, height = RENDER_SETTINGS["width"], RENDER_SETTINGS["height"]
+        background_clip = load_background(background.path, width, height, plan.duration) if background else None
+        output_file = os.path.join(self.output_dir, f"{job['id']}.mp4")
+        render_video(
+            plan,
+            state_images,
+            output_file,
+            RENDER_SETTINGS,
+            background=background_clip,
+            audio_path=audio.path if audio else None
+        )
+        path = self.video_cache.put(cache_key, output_file, move=True)
+        self._update(job, status="done", path=path)
+
+    def _render_preview(self, job, entry, plan):
+        state_images = self._render_states(job, entry, plan)
+        cards = [state_images[state] for state in plan.states]
+        text = entry.get("video_text", "")
+
+        if job["output"] == "poster":
+            data = create_poster(cards[0], text, fmt=job["format"])
+        else:
+            data = create_animated_preview(cards, text, frame_duration=plan.state_durations(), fmt=job["format"])
+
+        path = os.path.join(self.output_dir, f"{job['id']}.{job['format']}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        self._update(job, status="done", path=path)
+
+    def _expire_jobs(self):
+        cutoff = time.time() - JOB_TTL
+        with self._lock:
+            expired = [
+                job for job in self.jobs.values()
+                if job["status"] in ("done", "failed") and job["updated"] < cutoff
+            ]
+            for job in expired:
+                del self.jobs[job["id"]]
+        for job in expired:
+            # Videos live in the cache; previews are ours to remove
+            if job["path"] and job["output"] != "video" and os.path.exists(job["path"]):
+                os.unlink(job["path"])
+
+    def close(self):
+        """Finish running jobs and release the render pools. The batcher goes first, so jobs
+        waiting on cards fail quickly instead of blocking the executor shutdown."""
+        self.batcher.close()
+        self._executor.shutdown(wait=True)
+
+    def get_job(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for job in self.jobs.values():
+                statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+        return {
+            "renderer": self.renderer.name,
+            "jobs": statuses,
+            "batches": self.batcher.batches,
+            "batched_cards": self.batcher.cards,
+            "video_cache": self.video_cache.stats(),
+        }
+
+
+def job_status(job):
+    status = {key: job[key] for key in ("id", "status", "output", "format", "created", "updated", "cached", "error", "plan")}
+    status["result_url"] = f"/jobs/{job['id']}/result" if job["status"] == "done" else None
+    return status
+
+
+class _BodyReader:
+    """File-like view of exactly Content-Length bytes of a request body."""
+
+    def __init__(self, rfile, length):
+        self.rfile = rfile
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.rfile.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _content_length(self):
+        try:
+            return int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            return None
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        length = self._content_length()
+        if length is None:
+            self._json(411, {"error": "Content-Length required"})
+            return
+
+        if parts.path == '/assets':
+            name = parse_qs(parts.query).get('name', [''])[0]
+            asset = self.service.asset_store.put_stream(_BodyReader(self.rfile, length), os.path.splitext(name)[1])
+            self._json(201, {"hash": asset.hash, "size": asset.size})
+            return
+
+        if parts.path == '/jobs':
+            try:
+                request = json.loads(self.rfile.read(length).decode('utf-8'))
+                if not isinstance(request, dict):
+                    raise ValueError("request body must be an object")
+                job = self.service.submit(request)
+            except ValueError as e:
+                self._json(400, {"error": str(e)})
+                return
+            self._json(202, job_status(job))
+            return
+
+        self._json(404, {"error": "Not found"})
+
+    def do_GET(self):
+        self._get(send_body=True)
+
+    def do_HEAD(self):
+        self._get(send_body=False)
+
+    def _get(self, send_body):
+        segments = urlsplit(self.path).path.strip('/').split('/')
+
+        if segments == ['health']:
+            self._json(200, self.service.stats())
+            return
+
+        if len(segments) in (2, 3) and segments[0] == 'jobs':
+            job = self.service.get_job(segments[1])
+            if job is None:
+                self._json(404, {"error": "Unknown job"})
+                return
+
+            if len(segments) == 2:
+                self._json(200, job_status(job))
+                return
+
+            if segments[2] == 'result':
+                if job["status"] != "done":
+                    self._json(409, {"error": f"Job is {job['status']}"})
+                    return
+                mime = "video/mp4" if job["output"] == "video" else MIME_TYPES[job["format"]]
+                try:
+                    send_file(self, job["path"], send_body, content_type=mime)
+                except FileNotFoundError:
+                    # Finished videos live in the LRU cache and may have been evicted since
+                    self._json(410, {"error": "Result is no longer available, submit the job again"})
+                return
+
+        self._json(404, {"error": "Not found"})
+
+
+def make_server(host=RENDER_SERVER_HOST, port=RENDER_SERVER_PORT, renderer_name=AUTO):
+    service = RenderService(renderer_name)
+    handler = type('BoundRenderHandler', (RenderHandler,), {'service': service})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    httpd.service = service
+    return httpd
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local decision card render API")
+    parser.add_argument("--host", default=RENDER_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=RENDER_SERVER_PORT)
+    parser.add_argument("--renderer", default=AUTO, help="auto, pil, wkhtmltoimage or chrome")
+    args = parser.parse_args()
+
+    httpd = make_server(args.host, args.port, args.renderer)
+    print(f"Render API listening on http://{args.host}:{httpd.server_address[1]}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        httpd.service.close()
+        close_renderers()
+
+
+if __name__ == "__main__":
+    main()
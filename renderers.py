@@ -0,0 +1,365 @@
+import atexit
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from cards import CARD_WIDTH, CARD_HEIGHT, create_card_html, create_cards_batch_html, create_card_image
+
+# Number of cards rendered at once. Rendering is mostly spent in PIL, subprocesses or the
+# browser, all of which release the GIL, so threads are enough.
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', str(min(8, os.cpu_count() or 1))))
+
+# Capability flags a backend can advertise
+CAP_THREAD_SAFE = "thread_safe"    # Cards can be rendered concurrently
+CAP_BATCH = "batch"                # Renders all of an entry's cards from one page load
+
+
+def remove_green_screen(img):
+    """Make the rgb(0, 255, 0) page background transparent without touching white text."""
+    data = np.array(img.convert("RGBA"))
+    green = (data[:, :, 0] < 50) & (data[:, :, 1] > 200) & (data[:, :, 2] < 50)
+    data[green] = (255, 255, 255, 0)
+    return Image.fromarray(data, "RGBA")
+
+
+class CardRenderer:
+    """Turns one choice of an entry into an 800x1200 RGBA card image."""
+
+    name = "base"
+    capabilities = frozenset()
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def has(self, capability):
+        return capability in self.capabilities
+
+    def render(self, category, title, description, active_choice, all_choices):
+        raise NotImplementedError
+
+    def render_all(self, category, title, description, choices, max_workers=None, active_choices=None):
+        """Render a card for every choice (or just active_choices), in order."""
+        def render_one(choice):
+            return self.render(category, title, description, choice, choices)
+
+        if active_choices is None:
+            active_choices = choices
+
+        workers = max_workers or RENDER_WORKERS
+        if not self.has(CAP_THREAD_SAFE) or workers <= 1 or len(active_choices) <= 1:
+            return [render_one(choice) for choice in active_choices]
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(active_choices))) as pool:
+            return list(pool.map(render_one, active_choices))
+
+    def close(self):
+        """Release anything the backend keeps warm between renders."""
+        pass
+
+
+class PILRenderer(CardRenderer):
+    """Draws the card directly with PIL. Always available and the cheapest option."""
+
+    name = "pil"
+    capabilities = frozenset({CAP_THREAD_SAFE})
+
+    def render(self, category, title, description, active_choice, all_choices):
+        return create_card_image(category, title, description, active_choice, all_choices)
+
+
+class WkhtmltoimageRenderer(CardRenderer):
+    """Renders the HTML card with the wkhtmltoimage command line tool."""
+
+    name = "wkhtmltoimage"
+    capabilities = frozenset({CAP_THREAD_SAFE, CAP_BATCH})
+    binary = os.getenv('WKHTMLTOIMAGE_BINARY', 'wkhtmltoimage')
+
+    @classmethod
+    def is_available(cls):
+        return shutil.which(cls.binary) is not None
+
+    def render(self, category, title, description, active_choice, all_choices):
+        html = create_card_html(category, title, description, active_choice, all_choices)
+        return self._rasterize(html, CARD_HEIGHT)
+
+    def render_all(self, category, title, description, choices, max_workers=None, active_choices=None):
+        """Stack every card in one tall page and slice it up, so the entry costs one invocation."""
+        if active_choices is None:
+            active_choices = choices
+        if len(active_choices) <= 1:
+            return super().render_all(category, title, description, choices, max_workers, active_choices)
+
+        html = create_cards_batch_html(category, title, description, choices, active_choices, stacked=True)
+        sheet = self._rasterize(html, CARD_HEIGHT * len(active_choices))
+        return [
+            sheet.crop((0, i * CARD_HEIGHT, CARD_WIDTH, (i + 1) * CARD_HEIGHT))
+            for i in range(len(active_choices))
+        ]
+
+    def _rasterize(self, html, height):
+        temp_dir = tempfile.mkdtemp(prefix="card_")
+        html_path = os.path.join(temp_dir, "card.html")
+        png_path = os.path.join(temp_dir, "card.png")
+        try:
+            with open(html_path, 'w', encoding='utf-8') as f:
+                f.write(html)
+
+            subprocess.run([
+                self.binary,
+                "--quiet",
+                "--transparent",
+                "--width", str(CARD_WIDTH),
+                "--height", str(height),
+                html_path,
+                png_path
+            ], check=True)
+
+            with Image.open(png_path) as img:
+                return remove_green_screen(img)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class ChromeRenderer(CardRenderer):
+    """Renders the HTML card in headless Chrome.
+
+    Browsers are kept in a pool of at most max_drivers, checked out for each render and
+    returned afterwards, so they stay warm without piling up across worker threads.
+    """
+
+    name = "chrome"
+    capabilities = frozenset({CAP_THREAD_SAFE, CAP_BATCH})
+
+    def __init__(self, max_drivers=None):
+        self.max_drivers = max(1, max_drivers or RENDER_WORKERS)
+        self._slots = threading.BoundedSemaphore(self.max_drivers)
+        self._idle = queue.LifoQueue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def is_available(cls):
+        try:
+            import selenium  # noqa: F401
+        except ImportError:
+            return False
+        return any(shutil.which(name) for name in (
+            "chromedriver", "google-chrome", "chromium", "chromium-browser", "chrome"
+        ))
+
+    def _start_driver(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--hide-scrollbars")
+        chrome_options.add_argument("--force-device-scale-factor=1")
+        chrome_options.add_argument("--disable-gpu")
+
+        driver = webdriver.Chrome(options=chrome_options)
+        driver.set_window_size(CARD_WIDTH, CARD_HEIGHT)
+        with self._lock:
+            self._drivers.append(driver)
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def _driver(self):
+        """Check a browser out of the pool, starting one if none is idle, and return it afterwards."""
+        self._slots.acquire()
+        driver = None
+        try:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self._start_driver()
+            yield driver
+        except Exception:
+            # The browser may be in a bad state - don't hand it to the next render
+            if driver is not None:
+                self._discard(driver)
+                driver = None
+            raise
+        finally:
+            if driver is not None:
+                self._idle.put(driver)
+            self._slots.release()
+
+    def render(self, category, title, description, active_choice, all_choices):
+        html = create_card_html(category, title, description, active_choice, all_choices)
+        with tempfile.NamedTemporaryFile('w', suffix='.html', encoding='utf-8', delete=False) as f:
+            f.write(html)
+            html_path = f.name
+
+        try:
+            with self._driver() as driver:
+                driver.get(f'file:///{html_path}')
+                driver.implicitly_wait(2)
+                png = driver.get_screenshot_as_png()
+        finally:
+            try:
+                os.unlink(html_path)
+            except OSError:
+                pass
+
+        with Image.open(BytesIO(png)) as img:
+            return remove_green_screen(img)
+
+    def render_all(self, category, title, description, choices, max_workers=None, active_choices=None):
+        """Load one page holding every card, switch between them with script and screenshot just the card element."""
+        if active_choices is None:
+            active_choices = choices
+        if len(active_choices) <= 1:
+            return super().render_all(category, title, description, choices, max_workers, active_choices)
+
+        from selenium.webdriver.common.by import By
+
+        html = create_cards_batch_html(category, title, description, choices, active_choices)
+        with tempfile.NamedTemporaryFile('w', suffix='.html', encoding='utf-8', delete=False) as f:
+            f.write(html)
+            html_path = f.name
+
+        images = []
+        try:
+            with self._driver() as driver:
+                driver.get(f'file:///{html_path}')
+                driver.implicitly_wait(2)
+
+                for i in range(len(active_choices)):
+                    driver.execute_script("setActive(arguments[0]);", i)
+                    element = driver.find_element(By.CSS_SELECTOR, f'.card-state[data-index="{i}"] .decision-card')
+                    rect = element.rect
+                    with Image.open(BytesIO(element.screenshot_as_png)) as shot:
+                        card = remove_green_screen(shot)
+
+                    # Put the card back where it sits on the full-size canvas
+                    canvas = Image.new('RGBA', (CARD_WIDTH, CARD_HEIGHT), (0, 0, 0, 0))
+                    canvas.paste(card, (int(rect['x']), int(rect['y'])), card)
+                    images.append(canvas)
+        finally:
+            try:
+                os.unlink(html_path)
+            except OSError:
+                pass
+        return images
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+RENDERERS = {
+    PILRenderer.name: PILRenderer,
+    WkhtmltoimageRenderer.name: WkhtmltoimageRenderer,
+    ChromeRenderer.name: ChromeRenderer,
+}
+
+AUTO = "auto"
+
+# Sample entry used to time the backends
+_BENCHMARK_CHOICES = [
+    {"name": "Option A", "pros": ["Quick to set up", "Cheap"], "cons": ["Needs upkeep"]},
+    {"name": "Option B", "pros": ["Lasts a long time"], "cons": ["Expensive", "Hard to find"]},
+]
+
+_instances = {}
+_auto_choice = None
+_registry_lock = threading.Lock()
+
+
+def available_renderers():
+    """Names of the backends that can run on this host."""
+    return [name for name, cls in RENDERERS.items() if cls.is_available()]
+
+
+def benchmark_renderer(renderer, rounds=2):
+    """Seconds per entry for a renderer, after a warm-up render.
+
+    Times render_all on the two-choice sample, since that's the path videos and the render
+    API use - batching backends load one page for the whole entry there.
+    """
+    sample = ("Benchmark", "Which one?", "Timing the renderer", _BENCHMARK_CHOICES)
+    renderer.render_all(*sample)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        renderer.render_all(*sample)
+    return (time.perf_counter() - start) / rounds
+
+
+def _select_fastest():
+    timings = {}
+    for name in available_renderers():
+        renderer = _instances.get(name) or RENDERERS[name]()
+        try:
+            timings[name] = benchmark_renderer(renderer)
+        except Exception:
+            # Installed but broken (e.g. no display, driver mismatch) - skip it
+            renderer.close()
+            continue
+        _instances[name] = renderer
+    if not timings:
+        return PILRenderer.name
+
+    fastest = min(timings, key=timings.get)
+    # Don't keep browsers open for backends we're not going to use
+    for name in timings:
+        if name != fastest:
+            _instances.pop(name).close()
+    return fastest
+
+
+def get_renderer(name=AUTO):
+    """Return a warm renderer instance. 'auto' benchmarks the available backends once and keeps the fastest."""
+    global _auto_choice
+    with _registry_lock:
+        if name == AUTO:
+            if _auto_choice is None:
+                _auto_choice = _select_fastest()
+            name = _auto_choice
+
+        if name not in RENDERERS:
+            raise ValueError(f"Unknown renderer: {name}")
+
+        if name not in _instances:
+            _instances[name] = RENDERERS[name]()
+        return _instances[name]
+
+
+@atexit.register
+def close_renderers():
+    """Quit every browser the renderers have open."""
+    with _registry_lock:
+        renderers = list(_instances.values())
+        _instances.clear()
+    for renderer in renderers:
+        renderer.close()
@@ -0,0 +1,52 @@
+import io
+import os
+import time
+
+from asset_store import AssetStore
+
+
+def test_asset_store_deduplicates(tmp_path):
+    store = AssetStore(str(tmp_path / "assets"))
+    first = store.put_stream(io.BytesIO(b"song"), ".MP3")
+    second = store.put_stream(io.BytesIO(b"song"), ".mp3")
+    assert first == second
+    assert first.path.endswith(".mp3")
+    assert os.listdir(os.path.join(store.root, "tmp")) == []
+
+
+def test_asset_store_gc_skips_referenced_assets(tmp_path):
+    store = AssetStore(str(tmp_path / "assets"))
+    used = store.put_stream(io.BytesIO(b"used"))
+    unused = store.put_stream(io.BytesIO(b"unused"))
+    store.acquire(used.hash)
+
+    assert store.gc(max_age=-1) == 1
+    assert store.get(unused.hash) is None
+    assert not os.path.exists(unused.path)
+    assert store.get(used.hash) == used
+
+    store.release(used.hash)
+    assert store.gc(max_age=-1) == 1
+    assert store.get(used.hash) is None
+
+
+def test_asset_store_gc_trims_to_max_bytes(tmp_path):
+    store = AssetStore(str(tmp_path / "assets"))
+    old = store.put_stream(io.BytesIO(b"a" * 10))
+    time.sleep(0.01)
+    new = store.put_stream(io.BytesIO(b"b" * 10))
+
+    assert store.gc(max_bytes=15) == 1
+    assert store.get(old.hash) is None
+    assert store.get(new.hash) == new
+
+
+def test_asset_store_references_do_not_survive_a_restart(tmp_path):
+    store = AssetStore(str(tmp_path / "assets"))
+    asset = store.put_stream(io.BytesIO(b"song"))
+    store.acquire(asset.hash)
+
+    # A process that died mid-render never released its reference
+    restarted = AssetStore(store.root)
+    assert restarted.gc(max_age=-1) == 1
+    assert restarted.get(asset.hash) is None
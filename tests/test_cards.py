@@ -0,0 +1,16 @@
+from cards import create_card_html_body
+
+
+def test_card_html_escapes_entry_text():
+    choices = [
+        {"name": "A < B", "pros": ["<iframe src='file:///etc/passwd'></iframe>"], "cons": ["Tom & Jerry"]},
+        {"name": "C", "pros": [], "cons": []},
+    ]
+    html = create_card_html_body("<b>Food</b>", "Lunch?", 'Say "hi"', choices[0], choices)
+    assert "<iframe" not in html and "<b>" not in html
+    assert "A &lt; B" in html
+    assert "&lt;b&gt;Food&lt;/b&gt;" in html
+    assert "Tom &amp; Jerry" in html
+    assert "Say &quot;hi&quot;" in html
+    # The active choice is still highlighted
+    assert html.count("2px solid #5d89e2") == 1
@@ -0,0 +1,93 @@
+import types
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+import fonts
+from fonts import FontChain, font_covers
+
+
+@pytest.fixture
+def coverage(monkeypatch):
+    """Pretend font files: "latin" maps ASCII only, "cjk" maps everything. Returns the _cmap calls."""
+    calls = []
+
+    def fake_cmap(path, index):
+        calls.append(path)
+        if path == "latin.ttf":
+            return frozenset(range(128))
+        return frozenset(range(0x110000))
+
+    monkeypatch.setattr(fonts, "_coverage", {})
+    monkeypatch.setattr(fonts, "_cmap", fake_cmap)
+    return calls
+
+
+def _font(path, size=20):
+    # A real font for measuring, tagged with the path the coverage check looks at
+    font = ImageFont.load_default(size=size)
+    font.path = path
+    return font
+
+
+def test_font_covers_caches_per_file_and_codepoint(coverage):
+    latin = types.SimpleNamespace(path="latin.ttf", index=0)
+    assert font_covers(latin, "a")
+    assert not font_covers(latin, "你")
+    assert font_covers(latin, "a")
+    assert coverage == ["latin.ttf", "latin.ttf"]
+    # Whitespace and joiners never need a glyph
+    assert font_covers(latin, "\u200d") and font_covers(latin, " ")
+    assert coverage == ["latin.ttf", "latin.ttf"]
+
+
+def test_runs_switch_fonts_per_character(coverage):
+    latin, cjk = _font("latin.ttf"), _font("cjk.ttf")
+    chain = FontChain([latin, cjk])
+    runs = chain.runs("Hi 你好 ok\u200d")
+    assert [(text, font.path) for text, font in runs] == [
+        ("Hi ", "latin.ttf"),
+        # The space after a CJK character stays in its run
+        ("你好 ", "cjk.ttf"),
+        ("ok\u200d", "latin.ttf"),
+    ]
+    assert chain.getlength("Hi 你好") == pytest.approx(latin.getlength("Hi ") + cjk.getlength("你好"))
+
+
+def test_font_for_resolves_each_character_once(coverage):
+    chain = FontChain([_font("latin.ttf"), _font("cjk.ttf")])
+    chain.runs("你你你")
+    chain.runs("你")
+    assert coverage.count("latin.ttf") == 1
+
+
+def test_wrap_breaks_text_without_spaces():
+    chain = FontChain([ImageFont.load_default(size=20)])
+    text = "决定" * 20
+    max_width = chain.getlength("决定" * 3)
+    lines = chain.wrap(text, max_width)
+    assert len(lines) > 1
+    assert "".join(lines) == text
+    assert all(chain.getlength(line) <= max_width for line in lines)
+
+
+def test_wrap_splits_overlong_words_only():
+    chain = FontChain([ImageFont.load_default(size=20)])
+    long_word = "x" * 40
+    max_width = chain.getlength("x" * 10)
+    lines = chain.wrap(f"a b {long_word} end", max_width)
+    assert lines[0] == "a b"
+    assert "".join(lines[1:]).replace(" ", "") == long_word + "end"
+    assert all(chain.getlength(line) <= max_width for line in lines)
+
+
+def test_draw_matches_getbbox():
+    chain = FontChain([ImageFont.load_default(size=20)])
+    image = Image.new("RGBA", (300, 60), (0, 0, 0, 0))
+    chain.draw(ImageDraw.Draw(image), (10, 10), "Decide", fill=(255, 255, 255, 255))
+    left, top, right, bottom = chain.getbbox("Decide")
+    drawn = image.getchannel("A").getbbox()
+    # getbbox is a layout box like PIL's, so the ink sits inside it
+    assert drawn is not None
+    assert 10 + left <= drawn[0] and drawn[2] <= 10 + right + 1
+    assert 10 + top <= drawn[1] and drawn[3] <= 10 + bottom + 1
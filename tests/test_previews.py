@@ -0,0 +1,80 @@
+import io
+
+import pytest
+from PIL import Image
+
+from previews import create_animated_preview, create_poster
+
+COLORS = [(200, 30, 30), (30, 200, 30), (30, 30, 200)]
+
+
+def _cards():
+    # Stand-ins for rendered cards: a solid panel on a transparent 800x1200 canvas
+    cards = []
+    for color in COLORS:
+        card = Image.new("RGBA", (800, 1200), (0, 0, 0, 0))
+        card.paste(Image.new("RGBA", (680, 850), color + (255,)), (60, 250))
+        cards.append(card)
+    return cards
+
+
+def _local_color_tables(data):
+    """Count the frames of a GIF that carry their own palette instead of the global one."""
+    position = 13
+    if data[10] & 0x80:
+        position += 3 * 2 ** ((data[10] & 0x07) + 1)
+    count = 0
+    while data[position] != 0x3B:
+        if data[position] == 0x21:
+            # Extension: label, then data sub-blocks
+            position += 2
+        else:
+            packed = data[position + 9]
+            position += 10
+            if packed & 0x80:
+                count += 1
+                position += 3 * 2 ** ((packed & 0x07) + 1)
+            # LZW minimum code size, then data sub-blocks
+            position += 1
+        while data[position]:
+            position += data[position] + 1
+        position += 1
+    return count
+
+
+@pytest.mark.parametrize("fmt, pil_format", [("png", "PNG"), ("webp", "WEBP")])
+def test_poster(fmt, pil_format):
+    poster = Image.open(io.BytesIO(create_poster(_cards()[0], "Which one?", width=540, fmt=fmt)))
+    assert poster.format == pil_format
+    assert poster.size == (540, 960)
+    # The card sits on the black frame at the same place as in the video
+    rgb = poster.convert("RGB")
+    assert rgb.getpixel((270, 500)) == pytest.approx(COLORS[0], abs=8)
+    assert rgb.getpixel((5, 5)) == (0, 0, 0)
+
+
+def test_gif_frames_share_one_palette():
+    data = create_animated_preview(_cards(), "Which one?", frame_duration=[1, 1.5, 2], width=180)
+    animation = Image.open(io.BytesIO(data))
+    assert animation.format == "GIF"
+    assert animation.size == (180, 320)
+    assert animation.n_frames == 3
+    assert data[10] & 0x80, "GIF has no global palette"
+    assert _local_color_tables(data) == 0
+
+    durations = []
+    for index, color in enumerate(COLORS):
+        animation.seek(index)
+        durations.append(animation.info["duration"])
+        assert animation.convert("RGB").getpixel((90, 160)) == pytest.approx(color, abs=16)
+    assert durations == [1000, 1500, 2000]
+
+
+def test_webp_animation():
+    data = create_animated_preview(_cards()[:2], "", frame_duration=0.5, width=180, fmt="webp")
+    animation = Image.open(io.BytesIO(data))
+    assert animation.format == "WEBP"
+    assert animation.is_animated and animation.n_frames == 2
+    animation.seek(1)
+    animation.load()
+    assert animation.info["duration"] == 500
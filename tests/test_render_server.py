@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import asset_store
+import render_server
+import video_cache
+
+ENTRY = {
+    "category": "Food",
+    "title": "Lunch?",
+    "description": "Pick one",
+    "video_text": "Which one?",
+    "choices": [
+        {"name": "Pizza", "pros": ["Fast"], "cons": ["Greasy"]},
+        {"name": "Salad", "pros": ["Light"], "cons": []},
+    ],
+}
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # Keep the asset store, video cache and job files inside the test directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(asset_store, "_asset_store", None)
+    monkeypatch.setattr(video_cache, "_video_cache", None)
+    httpd = render_server.make_server(port=0, renderer_name="pil")
+    threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    httpd.service.close()
+
+
+def _request(server, path, body=None, headers=None):
+    """Returns (status, headers, body bytes) without raising on error statuses."""
+    request = urllib.request.Request(server.url + path, data=body, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.headers, error.read()
+
+
+def _submit(server, request):
+    body = request if isinstance(request, bytes) else json.dumps(request).encode("utf-8")
+    status, _, data = _request(server, "/jobs", body, {"Content-Type": "application/json"})
+    return status, json.loads(data)
+
+
+def _wait(server, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        _, _, data = _request(server, f"/jobs/{job_id}")
+        job = json.loads(data)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_asset_upload_is_deduplicated(server):
+    status, _, first = _request(server, "/assets?name=song.MP3", b"not really music")
+    assert status == 201
+    status, _, second = _request(server, "/assets?name=copy.mp3", b"not really music")
+    assert status == 201
+    first, second = json.loads(first), json.loads(second)
+    assert first == second
+    assert first["size"] == len(b"not really music")
+    assert server.service.asset_store.get(first["hash"]).path.endswith(".mp3")
+
+
+@pytest.mark.parametrize("body", [
+    b"not json",
+    b"[1, 2]",
+    b'{"entry": {"choices": []}}',
+    b'{"entry": {"choices": [{"name": "A", "pros": "yes"}]}}',
+    b'{"entry": {"choices": [{"name": "A"}]}, "timeline": [1]}',
+    b'{"entry": {"choices": [{"name": "A"}]}, "timeline": {"intro": 5}}',
+    b'{"entry": {"choices": [{"name": "A"}]}, "timeline": {"overlays": ["hi"]}}',
+    b'{"entry": {"choices": [{"name": "A"}]}, "timeline": {"card_duration": 1e400}}',
+    b'{"entry": {"choices": [{"name": "A"}]}, "timeline": {"final_decision": {"choice": Infinity}}}',
+    b'{"entry": {"choices": [{"name": "A"}]}, "timeline": {"loops": 1e9}}',
+    b'{"entry": {"choices": [{"name": "A"}]}, "timeline": {"max_cards": 0.5}}',
+    b'{"entry": {"choices": [{"name": "A"}]}, "audio": ["x"]}',
+    b'{"entry": {"choices": [{"name": "A"}]}, "audio": "0000"}',
+    b'{"entry": {"choices": [{"name": "A"}]}, "output": "poster", "format": ["png"]}',
+])
+def test_malformed_jobs_are_rejected(server, body):
+    status, response = _submit(server, body)
+    assert status == 400
+    assert response["error"]
+    assert server.service.jobs == {}
+
+
+def test_poster_job_and_ranged_result(server):
+    status, job = _submit(server, {"entry": ENTRY, "output": "poster"})
+    assert status == 202
+    job = _wait(server, job["id"])
+    assert job["status"] == "done", job["error"]
+
+    status, headers, data = _request(server, job["result_url"])
+    assert status == 200
+    assert headers["Content-Type"] == "image/png"
+    assert data.startswith(b"\x89PNG")
+
+    status, headers, part = _request(server, job["result_url"], headers={"Range": "bytes=0-7"})
+    assert status == 206
+    assert headers["Content-Range"] == f"bytes 0-7/{len(data)}"
+    assert part == data[:8]
+
+
+def test_animation_job_with_optional_fields_left_out(server):
+    entry = {"choices": [{"name": "A"}, {"name": "B"}]}
+    timeline = {"card_duration": "1.5", "intro": {"duration": 1}}
+    status, job = _submit(server, {"entry": entry, "output": "animation", "timeline": timeline})
+    assert status == 202
+    job = _wait(server, job["id"])
+    assert job["status"] == "done", job["error"]
+
+
+def test_evicted_video_result_is_gone(server, monkeypatch):
+    def fake_render_video(plan, state_images, output_file, settings, **kwargs):
+        with open(output_file, "wb") as f:
+            f.write(b"\0" * 100)
+        return output_file
+    monkeypatch.setattr(render_server, "render_video", fake_render_video)
+
+    status, job = _submit(server, {"entry": ENTRY})
+    assert status == 202
+    job = _wait(server, job["id"])
+    assert job["status"] == "done", job["error"]
+    status, _, data = _request(server, job["result_url"])
+    assert status == 200 and len(data) == 100
+
+    # A newer video pushes the job's out of a cache that only fits one
+    cache = server.service.video_cache
+    cache.max_bytes = 150
+    newer = os.path.join(server.service.output_dir, "newer.mp4")
+    with open(newer, "wb") as f:
+        f.write(b"\0" * 100)
+    cache.put("newer", newer, move=True)
+
+    status, _, data = _request(server, job["result_url"])
+    assert status == 410
+    assert json.loads(data)["error"]
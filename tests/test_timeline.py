@@ -0,0 +1,116 @@
+import pytest
+from PIL import Image
+
+from timeline import DEFAULT_TIMELINE, INTRO, compile_timeline, render_states
+
+
+def test_default_timeline_loops_cards():
+    plan = compile_timeline(None, 3)
+    assert [segment.state for segment in plan.segments] == [("card", i) for i in [0, 1, 2, 0, 1, 2]]
+    assert plan.duration == pytest.approx(6 * DEFAULT_TIMELINE["card_duration"])
+    # Only the first segment gets the delayed fade-in
+    assert plan.segments[0].delay == DEFAULT_TIMELINE["start_delay"]
+    assert all(segment.delay == 0 and segment.fade == 0 for segment in plan.segments[1:])
+
+
+def test_repeated_states_are_merged():
+    plan = compile_timeline({"loops": 3, "final_decision": {"choice": 0, "duration": 2}}, 1)
+    assert [segment.state for segment in plan.segments] == [("card", 0), ("final", 0)]
+    assert plan.segments[0].duration == pytest.approx(4.5)
+    assert plan.segments[1].start == pytest.approx(4.5)
+
+
+def test_boundaries_snap_to_frames():
+    plan = compile_timeline({"card_duration": 1.01, "start_delay": 0}, 2, fps=10)
+    assert [segment.start for segment in plan.segments] == pytest.approx([0, 1, 2, 3])
+    assert plan.duration == pytest.approx(4)
+
+
+def test_unique_segments_and_states():
+    plan = compile_timeline({"intro": {"duration": 1}, "loops": 2}, 2)
+    assert plan.states == [INTRO, ("card", 0), ("card", 1)]
+    # The intro carries the fade, so every card segment repeats exactly
+    assert plan.describe()["segments"] == 5
+    assert len(plan.unique_segments()) == 3
+
+
+def test_overlays_are_clamped_to_the_video():
+    plan = compile_timeline({
+        "overlays": [
+            {"text": " Which one? ", "start": -1},
+            {"text": "Later", "start": 2, "end": 100},
+            {"text": "   "},
+            {"text": "Never", "start": 50},
+        ]
+    }, 2)
+    assert [(o.text, o.start, o.end) for o in plan.overlays] == [
+        ("Which one?", 0.0, plan.duration),
+        ("Later", 2.0, plan.duration),
+    ]
+    assert plan.has_static_overlays() is False
+
+
+@pytest.mark.parametrize("spec", [
+    [1],
+    {"intro": 5},
+    {"intro": {"duration": -1}},
+    {"card_duration": 0},
+    {"max_cards": 0},
+    {"max_cards": -1},
+    {"max_cards": 0.5},
+    {"loops": 0},
+    {"loops": -2},
+    {"loops": 1e9},
+    {"max_cards": 1000},
+    {"card_duration": float("inf")},
+    {"card_duration": 1e308},
+    {"start_delay": float("nan")},
+    {"final_decision": {"choice": float("inf")}},
+    {"card_duration": "slow"},
+    {"final_decision": {"choice": 3}},
+    {"final_decision": {"duration": 0}},
+    {"final_decision": "yes"},
+    {"overlays": "hi"},
+    {"overlays": ["hi"]},
+    {"overlays": [{"text": 5}]},
+    {"overlays": [{"text": "hi", "end": "soon"}]},
+])
+def test_malformed_specs_raise_value_error(spec):
+    with pytest.raises(ValueError):
+        compile_timeline(spec, 3)
+
+
+def test_needs_a_choice():
+    with pytest.raises(ValueError):
+        compile_timeline(None, 0)
+
+
+class _RecordingRenderer:
+    def __init__(self):
+        self.batches = []
+
+    def render_all(self, category, title, description, choices, active_choices=None):
+        self.batches.append([choice["name"] for choice in active_choices])
+        return [Image.new("RGBA", (800, 1200)) for _ in active_choices]
+
+    def render(self, *args):
+        raise AssertionError("every state should come from the single batch")
+
+
+def test_render_states_batches_the_intro():
+    choices = [{"name": "A", "pros": [], "cons": []}, {"name": "B", "pros": [], "cons": []}]
+    plan = compile_timeline({"intro": {"duration": 1}, "final_decision": {"choice": 1}}, 2)
+    renderer = _RecordingRenderer()
+    images = render_states(plan, renderer, "Food", "Lunch?", "", choices)
+    assert renderer.batches == [["A", "B", None]]
+    assert set(images) == set(plan.states)
+
+
+def test_state_durations_follow_the_plan():
+    plan = compile_timeline({
+        "intro": {"duration": 1},
+        "card_duration": "1.5",
+        "final_decision": {"choice": 0, "duration": 2},
+    }, 2)
+    assert plan.states == [INTRO, ("card", 0), ("card", 1), ("final", 0)]
+    assert plan.state_durations() == pytest.approx([1, 1.5, 1.5, 2])
@@ -0,0 +1,49 @@
+import os
+
+from video_cache import VideoCache
+
+
+def _video(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_video_cache_evicts_least_recently_used(tmp_path):
+    cache = VideoCache(str(tmp_path / "cache"), max_bytes=250)
+    for key in "abc":
+        cache.put(key, _video(tmp_path, f"{key}.mp4", 100))
+        if key == "b":
+            # Using "a" makes "b" the oldest entry
+            assert cache.get("a")
+
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 200
+    assert not os.path.exists(os.path.join(cache.cache_dir, "b.mp4"))
+
+
+def test_video_cache_put_can_move(tmp_path):
+    cache = VideoCache(str(tmp_path / "cache"), max_bytes=1000)
+    source = _video(tmp_path, "render.mp4", 10)
+    path = cache.put("a", source, move=True)
+    assert not os.path.exists(source)
+    assert os.path.getsize(path) == 10
+    assert cache.stats()["bytes"] == 10
+
+
+def test_video_cache_keeps_oversized_newest_entry(tmp_path):
+    cache = VideoCache(str(tmp_path / "cache"), max_bytes=50)
+    path = cache.put("big", _video(tmp_path, "big.mp4", 100))
+    assert os.path.exists(path)
+    assert cache.get("big") == path
+
+
+def test_video_cache_reloads_existing_files(tmp_path):
+    cache = VideoCache(str(tmp_path / "cache"), max_bytes=1000)
+    cache.put("a", _video(tmp_path, "a.mp4", 10))
+    reloaded = VideoCache(cache.cache_dir, max_bytes=1000)
+    assert reloaded.get("a")
+    assert reloaded.stats()["bytes"] == 10
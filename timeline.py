@@ -0,0 +1,478 @@
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+from moviepy.editor import (
+    ImageClip, TextClip, ColorClip, CompositeVideoClip,
+    VideoFileClip, AudioFileClip, concatenate_audioclips
+)
+
+from cards import CARD_POSITION, OVERLAY_Y, create_final_decision_image
+
+# Render settings - these are part of the output cache key, so change them here
+RENDER_SETTINGS = {
+    "width": 1080,
+    "height": 1920,
+    "fps": 24,
+    "codec": "libx264",
+    "audio_codec": "aac",
+    # Put the moov atom up front so players can start before the download finishes
+    "movflags": "+faststart",
+}
+
+# Declarative description of a video. Anything left out falls back to these values,
+# which reproduce the original format: up to 3 cards, 1.5 s each, shown twice.
+DEFAULT_TIMELINE = {
+    # {"duration": 1.5} shows the question card with no choice selected first
+    "intro": None,
+    "card_duration": 1.5,
+    # None shows every choice
+    "max_cards": 3,
+    "loops": 2,
+    # The very first segment appears after a short delay and fades in
+    "start_delay": 0.5,
+    "start_fade": 0.8,
+    # {"choice": 0, "duration": 2.0} ends on that choice with a "Final pick" banner
+    "final_decision": None,
+    # [{"text": "...", "start": 0, "end": None}] - end None means until the video ends
+    "overlays": [],
+}
+
+# Upper bounds for specs that arrive over the render API. Compiling runs in the request
+# thread, so a huge loop count would stall it before any rendering starts.
+MAX_LOOPS = 20
+MAX_CARDS = 20
+
+# A choice with nothing selected, used for the intro card
+BLANK_CHOICE = {"name": None, "pros": [], "cons": []}
+
+INTRO = ("intro",)
+
+# One visual state on screen for a stretch of time. delay/fade apply to the card
+# within the segment (the background and overlays are always visible).
+Segment = namedtuple("Segment", "state start duration delay fade")
+Overlay = namedtuple("Overlay", "text start end")
+
+
+class RenderPlan:
+    """Compiled timeline: the distinct visual states to render, and when each is shown."""
+
+    def __init__(self, segments, overlays, duration):
+        self.segments = segments
+        self.overlays = overlays
+        self.duration = duration
+        # Each distinct state is rendered exactly once, in order of first appearance
+        self.states = list(dict.fromkeys(segment.state for segment in segments))
+
+    def segment_key(self, segment):
+        """Segments with the same key produce identical frames, so they only need encoding once."""
+        return (segment.state, segment.duration, segment.delay, segment.fade)
+
+    def state_durations(self):
+        """How long each state in self.states is shown the first time it appears, in seconds."""
+        durations = {}
+        for segment in self.segments:
+            durations.setdefault(segment.state, segment.duration)
+        return [durations[state] for state in self.states]
+
+    def unique_segments(self):
+        return list(dict.fromkeys(self.segment_key(segment) for segment in self.segments))
+
+    def has_static_overlays(self):
+        """True when every overlay spans the whole video, so segments don't depend on their position."""
+        return all(
+            overlay.start <= 0 and overlay.end >= self.duration
+            for overlay in self.overlays
+        )
+
+    def describe(self):
+        return {
+            "duration": self.duration,
+            "segments": len(self.segments),
+            "unique_states": len(self.states),
+            "unique_segments": len(self.unique_segments()),
+        }
+
+
+def _seconds(value, name):
+    """Coerce a timeline number to float, raising ValueError for anything that isn't one."""
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a number")
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number") from None
+    # JSON allows Infinity and 1e400, which would overflow int() and round()
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    return value
+
+
+def compile_timeline(spec, num_choices, fps=24):
+    """Expand a timeline spec into a RenderPlan for an entry with num_choices choices.
+
+    Raises ValueError for malformed specs, so callers can report them instead of crashing.
+    """
+    if spec is not None and not isinstance(spec, dict):
+        raise ValueError("timeline must be an object")
+    spec = dict(DEFAULT_TIMELINE, **(spec or {}))
+
+    def snap(seconds, name):
+        # Keep every boundary on a frame so concatenated segments don't drift
+        frames = _seconds(seconds, name) * fps
+        if not math.isfinite(frames):
+            raise ValueError(f"{name} is too large")
+        return round(frames) / fps
+
+    if num_choices < 1:
+        raise ValueError("A timeline needs at least one choice")
+
+    order = []
+    intro = spec["intro"]
+    if intro is not None and not isinstance(intro, dict):
+        raise ValueError("intro must be an object")
+    if intro:
+        intro_duration = snap(intro.get("duration", 0), "intro duration")
+        if intro_duration < 0:
+            raise ValueError("intro duration can't be negative")
+        if intro_duration > 0:
+            order.append((INTRO, intro_duration))
+
+    card_count = min(num_choices, MAX_CARDS)
+    if spec["max_cards"] is not None:
+        max_cards = int(_seconds(spec["max_cards"], "max_cards"))
+        if not 1 <= max_cards <= MAX_CARDS:
+            raise ValueError(f"max_cards must be between 1 and {MAX_CARDS}")
+        card_count = min(card_count, max_cards)
+    card_duration = snap(spec["card_duration"], "card_duration")
+    if card_duration <= 0:
+        raise ValueError("card_duration must be positive")
+    loops = int(_seconds(spec["loops"], "loops"))
+    if not 1 <= loops <= MAX_LOOPS:
+        raise ValueError(f"loops must be between 1 and {MAX_LOOPS}")
+    for _ in range(loops):
+        for index in range(card_count):
+            order.append((("card", index), card_duration))
+
+    final = spec["final_decision"]
+    if final is not None:
+        if not isinstance(final, dict):
+            raise ValueError("final_decision must be an object")
+        choice = int(_seconds(final.get("choice", 0), "final_decision choice"))
+        if not 0 <= choice < num_choices:
+            raise ValueError(f"final_decision choice {choice} is out of range")
+        final_duration = snap(final.get("duration", 2.0), "final_decision duration")
+        if final_duration <= 0:
+            raise ValueError("final_decision duration must be positive")
+        order.append((("final", choice), final_duration))
+
+    # Merge back-to-back repeats of the same state (e.g. a single card looped)
+    merged = []
+    for state, duration in order:
+        if merged and merged[-1][0] == state:
+            merged[-1][1] += duration
+        else:
+            merged.append([state, duration])
+    if not merged:
+        raise ValueError("The timeline has nothing to show")
+
+    segments = []
+    start = 0.0
+    for index, (state, duration) in enumerate(merged):
+        delay = fade = 0.0
+        if index == 0:
+            delay = min(max(0.0, snap(spec["start_delay"], "start_delay")), duration)
+            fade = min(max(0.0, _seconds(spec["start_fade"], "start_fade")), duration - delay)
+        segments.append(Segment(state, snap(start, "start"), duration, delay, fade))
+        start += duration
+    duration = snap(start, "duration")
+
+    if spec["overlays"] is not None and not isinstance(spec["overlays"], list):
+        raise ValueError("overlays must be a list")
+    overlays = []
+    for overlay in spec["overlays"] or []:
+        if not isinstance(overlay, dict):
+            raise ValueError("each overlay must be an object")
+        text = overlay.get("text") or ""
+        if not isinstance(text, str):
+            raise ValueError("overlay text must be a string")
+        text = text.strip()
+        if not text:
+            continue
+        overlay_start = max(0.0, _seconds(overlay.get("start") or 0, "overlay start"))
+        overlay_end = overlay.get("end")
+        overlay_end = duration if overlay_end is None else min(_seconds(overlay_end, "overlay end"), duration)
+        if overlay_end > overlay_start:
+            overlays.append(Overlay(text, overlay_start, overlay_end))
+
+    return RenderPlan(segments, overlays, duration)
+
+
+def render_states(plan, renderer, category, title, description, choices):
+    """Rasterize every distinct state in the plan once. Returns {state: PIL image}."""
+    card_indices = sorted({state[1] for state in plan.states if state[0] in ("card", "final")})
+    active_choices = [choices[index] for index in card_indices]
+    # The intro goes in the same batch, so batching backends still load a single page
+    if INTRO in plan.states:
+        active_choices.append(BLANK_CHOICE)
+    cards = renderer.render_all(category, title, description, choices, active_choices=active_choices)
+    intro = cards[len(card_indices)] if INTRO in plan.states else None
+    cards = dict(zip(card_indices, cards))
+
+    images = {}
+    for state in plan.states:
+        if state == INTRO:
+            images[state] = intro
+        elif state[0] == "card":
+            images[state] = cards[state[1]]
+        elif state[0] == "final":
+            images[state] = create_final_decision_image(cards[state[1]], choices[state[1]]["name"])
+    return images
+
+
+def get_ffmpeg_binary():
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except Exception:
+        return "ffmpeg"
+
+
+def load_background(path, width, height, duration):
+    """Load a background video, center-cropped to fill the frame and looped or trimmed to duration."""
+    bg_clip = VideoFileClip(path)
+
+    # Resize to match our dimensions
+    if bg_clip.w / bg_clip.h > width / height:
+        # Video is wider than our target
+        bg_clip = bg_clip.resize(height=height)
+        # Center crop
+        x_center = bg_clip.w // 2
+        bg_clip = bg_clip.crop(
+            x1=x_center - width//2,
+            y1=0,
+            x2=x_center + width//2,
+            y2=height
+        )
+    else:
+        # Video is taller than our target
+        bg_clip = bg_clip.resize(width=width)
+        # Center crop
+        y_center = bg_clip.h // 2
+        bg_clip = bg_clip.crop(
+            x1=0,
+            y1=y_center - height//2,
+            x2=width,
+            y2=y_center + height//2
+        )
+
+    # Loop if needed
+    if bg_clip.duration < duration:
+        bg_clip = bg_clip.loop(duration=duration)
+    else:
+        bg_clip = bg_clip.subclip(0, duration)
+    return bg_clip
+
+
+def load_audio(path, duration):
+    """Load background music, looped and trimmed to duration."""
+    audio = AudioFileClip(path)
+
+    # Loop audio if it's shorter than video
+    if audio.duration < duration:
+        repeats = int(np.ceil(duration / audio.duration))
+        audio = concatenate_audioclips([audio] * repeats)
+
+    # Trim audio to match video duration
+    return audio.subclip(0, duration)
+
+
+def _state_clips(state_images):
+    # One ImageClip per distinct state; every segment showing it shares the same frame
+    return {
+        state: ImageClip(np.array(img.convert("RGBA")), transparent=True).set_position(CARD_POSITION)
+        for state, img in state_images.items()
+    }
+
+
+def _overlay_clips(overlays, width):
+    # TextClip goes through ImageMagick, so render each distinct text once
+    text_clips = {}
+    for overlay in overlays:
+        if overlay.text not in text_clips:
+            text_clips[overlay.text] = TextClip(
+                overlay.text,
+                fontsize=55,
+                color='white',
+                method='caption',
+                size=(width-150, None),
+                align='center'
+            ).set_position(('center', OVERLAY_Y))
+    return text_clips
+
+
+def _segment_card(clip, segment, offset):
+    card = clip.set_start(offset + segment.delay).set_duration(segment.duration - segment.delay)
+    if segment.fade > 0:
+        card = card.fadein(segment.fade)
+    return card
+
+
+def _write_clip(clip, path, settings, logger, audio=True, ffmpeg_params=None, temp_audiofile=None):
+    # MoviePy puts the temporary audio track in the working directory unless told otherwise,
+    # where concurrent renders would overwrite each other's - give each write its own
+    temp_dir = None
+    if temp_audiofile is None:
+        temp_dir = tempfile.mkdtemp(prefix="audio_")
+        temp_audiofile = os.path.join(temp_dir, "temp-audio.m4a")
+    try:
+        clip.write_videofile(
+            path,
+            fps=settings["fps"],
+            codec=settings["codec"],
+            audio=audio,
+            audio_codec=settings["audio_codec"],
+            temp_audiofile=temp_audiofile,
+            remove_temp=True,
+            ffmpeg_params=ffmpeg_params,
+            logger=logger,
+            verbose=False
+        )
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def write_progressive_video(video, output_file, total_duration, segment_seconds, settings, logger,
+                            on_segment=None, audio_path=None):
+    """Encode the video as a series of fragmented MP4 segments, reporting each one as it finishes,
+    then stitch them into a single faststart MP4 without re-encoding.
+
+    The segments are silent: encoding audio per segment adds AAC padding at every boundary, so
+    the music is muxed in once over the joined video instead, trimmed to total_duration.
+    """
+    segment_dir = tempfile.mkdtemp(prefix="preview_segments_")
+    try:
+        segment_paths = []
+        start = 0.0
+        index = 0
+        while start < total_duration - 1e-6:
+            end = min(start + segment_seconds, total_duration)
+            segment_path = os.path.join(segment_dir, f"segment_{index:03d}.mp4")
+            _write_clip(
+                video.subclip(start, end),
+                segment_path,
+                settings,
+                logger,
+                audio=False,
+                ffmpeg_params=["-movflags", "frag_keyframe+empty_moov+default_base_moof"]
+            )
+            segment_paths.append(segment_path)
+            if on_segment:
+                on_segment(segment_path, index)
+            start = end
+            index += 1
+
+        concat_segments(segment_paths, output_file, settings, segment_dir,
+                        audio_path=audio_path, duration=total_duration)
+    finally:
+        # The segments are only needed until they're joined
+        shutil.rmtree(segment_dir, ignore_errors=True)
+    return output_file
+
+
+def concat_segments(segment_paths, output_file, settings, work_dir, audio_path=None, duration=None):
+    """Join encoded segments with a stream copy, optionally muxing in looped background music."""
+    list_path = os.path.join(work_dir, "segments.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for segment_path in segment_paths:
+            f.write(f"file '{os.path.abspath(segment_path)}'\n")
+
+    command = [get_ffmpeg_binary(), "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path:
+        command += ["-stream_loop", "-1", "-i", audio_path, "-map", "0:v", "-map", "1:a", "-c:a", settings["audio_codec"]]
+    else:
+        command += ["-map", "0"]
+    command += ["-c:v", "copy"]
+    if duration is not None:
+        command += ["-t", f"{duration:.3f}"]
+    command += ["-movflags", settings["movflags"], output_file]
+
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _render_by_segments(plan, state_clips, text_clips, output_file, settings, audio_path, logger, on_segment):
+    # Plain background with fixed overlays: identical segments produce identical frames,
+    # so encode each distinct one once and reuse it wherever it repeats.
+    width, height = settings["width"], settings["height"]
+    work_dir = tempfile.mkdtemp(prefix="timeline_")
+    try:
+        encoded = {}
+        for segment in plan.segments:
+            key = plan.segment_key(segment)
+            if key in encoded:
+                continue
+
+            layers = [ColorClip(size=(width, height), color=(0, 0, 0), duration=segment.duration)]
+            layers.append(_segment_card(state_clips[segment.state], segment, 0))
+            layers += [text.set_start(0).set_duration(segment.duration) for text in text_clips.values()]
+
+            path = os.path.join(work_dir, f"segment_{len(encoded):03d}.mp4")
+            _write_clip(
+                CompositeVideoClip(layers, size=(width, height)).set_duration(segment.duration),
+                path,
+                settings,
+                logger,
+                audio=False
+            )
+            encoded[key] = path
+            if on_segment:
+                on_segment(path, len(encoded) - 1)
+
+        segment_paths = [encoded[plan.segment_key(segment)] for segment in plan.segments]
+        concat_segments(segment_paths, output_file, settings, work_dir, audio_path=audio_path, duration=plan.duration)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def render_video(plan, state_images, output_file, settings, background=None, audio_path=None,
+                 logger=None, on_segment=None):
+    """Encode a compiled plan to output_file.
+
+    background is an optional clip already sized to the frame (see load_background).
+    on_segment(path, index) is called as each encoded segment becomes available.
+    """
+    width, height = settings["width"], settings["height"]
+    state_clips = _state_clips(state_images)
+    text_clips = _overlay_clips(plan.overlays, width)
+
+    if background is None and plan.has_static_overlays():
+        _render_by_segments(plan, state_clips, text_clips, output_file, settings, audio_path, logger, on_segment)
+        return output_file
+
+    # Moving background or timed overlays - every frame can differ, so composite the full timeline
+    if background is None:
+        background = ColorClip(size=(width, height), color=(0, 0, 0), duration=plan.duration)
+
+    layers = [background]
+    for segment in plan.segments:
+        layers.append(_segment_card(state_clips[segment.state], segment, segment.start))
+    for overlay in plan.overlays:
+        layers.append(text_clips[overlay.text].set_start(overlay.start).set_duration(overlay.end - overlay.start))
+
+    video = CompositeVideoClip(layers, size=(width, height)).set_duration(plan.duration)
+
+    if on_segment:
+        # Encode segment by segment so the first ones can be shown straight away
+        segment_seconds = min(segment.duration for segment in plan.segments)
+        write_progressive_video(video, output_file, plan.duration, segment_seconds, settings, logger,
+                                on_segment, audio_path=audio_path)
+    else:
+        if audio_path:
+            video = video.set_audio(load_audio(audio_path, plan.duration))
+        _write_clip(video, output_file, settings, logger, ffmpeg_params=["-movflags", settings["movflags"]])
+    return output_file
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+# Where finished videos are kept and how much disk they may use
+VIDEO_CACHE_DIR = os.getenv('VIDEO_CACHE_DIR', 'video_cache')
+VIDEO_CACHE_MAX_BYTES = int(os.getenv('VIDEO_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+
+
+def normalize_entry(video_text, category, title, description, choices):
+    """Return the entry in a canonical form so cosmetic differences don't change the cache key."""
+    def clean(value):
+        return (value or "").strip()
+
+    return {
+        "video_text": clean(video_text),
+        "category": clean(category),
+        "title": clean(title),
+        "description": clean(description),
+        "choices": [
+            {
+                "name": clean(choice.get("name")),
+                "pros": [clean(p) for p in choice.get("pros", []) if clean(p)],
+                "cons": [clean(c) for c in choice.get("cons", []) if clean(c)],
+            }
+            for choice in choices
+        ],
+    }
+
+
+def make_cache_key(entry, audio_hash=None, bg_hash=None, settings=None):
+    """Build a content address from the normalized entry, asset hashes and render settings."""
+    payload = {
+        "entry": entry,
+        "audio": audio_hash,
+        "background": bg_hash,
+        "settings": settings or {},
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class VideoCache:
+    """Size-bounded LRU cache of finished MP4 files, keyed by content hash."""
+
+    def __init__(self, cache_dir=VIDEO_CACHE_DIR, max_bytes=VIDEO_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> file size, least recently used first
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_existing()
+
+    def _path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def _load_existing(self):
+        # Pick up videos from a previous run, oldest access first
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.mp4'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name[:-4], stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+
+        self._evict()
+
+    def get(self, key):
+        """Return the cached video path for key, or None on a miss."""
+        with self._lock:
+            path = self._path_for(key)
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # Touch the file so LRU order survives restarts
+                try:
+                    os.utime(path, None)
+                except OSError:
+                    pass
+                return path
+
+            if key in self._entries:
+                # File was removed behind our back
+                self._total_bytes -= self._entries.pop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, video_path, move=False):
+        """Copy a finished video into the cache and return the cached path.
+
+        With move=True the file is moved in instead, which avoids writing it a second time.
+        """
+        with self._lock:
+            path = self._path_for(key)
+            moved = False
+            if move:
+                try:
+                    os.replace(video_path, path)
+                    moved = True
+                except OSError:
+                    # Different filesystem - fall back to a copy
+                    pass
+            if not moved:
+                temp_path = path + ".part"
+                shutil.copyfile(video_path, temp_path)
+                os.replace(temp_path, path)
+                if move:
+                    os.unlink(video_path)
+
+            size = os.path.getsize(path)
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total_bytes += size
+
+            self._evict(keep=key)
+            return path
+
+    def _evict(self, keep=None):
+        # Drop least recently used videos until we're under the size limit
+        while self._total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            if key == keep:
+                # Never evict the video we're about to hand back
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(key)
+                continue
+            size = self._entries.pop(key)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self._path_for(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_video_cache = None
+_video_cache_lock = threading.Lock()
+
+
+def get_video_cache():
+    """Process-wide cache instance (Streamlit re-runs the script but keeps imported modules)."""
+    global _video_cache
+    with _video_cache_lock:
+        if _video_cache is None:
+            _video_cache = VideoCache()
+        return _video_cache